@@ -1,17 +1,74 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-from typing import List, Dict, Optional
+from contextlib import asynccontextmanager
+from typing import Any, List, Dict, Optional, Tuple
+import asyncio
+import json
 import os
+import time
 
 from core.config import settings
 from core.agent import agent
+from core.limiter import OverloadedError
+from core.llm import llm
+from core.sessions import new_session_id, session_store
+from tools.mongo_tool import mongo_tool
+from tools.python_tool import python_tool
+from tools.visualize import visualize_tool
+
+
+async def run_startup_checks(app: FastAPI):
+    """Probe LLM endpoints and MongoDB and pre-warm Python and chart
+    workers concurrently, then mark the app ready"""
+    start = time.perf_counter()
+    try:
+        llm_checks, mongo_connected, _, _ = await asyncio.gather(
+            llm.startup(),
+            mongo_tool.connect(),
+            python_tool.start(),
+            visualize_tool.start()
+        )
+    except Exception as e:
+        # e.g. a worker pool failed to spawn; /health reports it as failed
+        print(f"❌ Startup failed: {type(e).__name__}: {e}")
+        app.state.readiness.update({
+            "ready": False,
+            "error": f"{type(e).__name__}: {e}",
+            "startup_seconds": round(time.perf_counter() - start, 3)
+        })
+        return
+    app.state.readiness.update({
+        "ready": True,
+        "llm_endpoints": {check["endpoint"]: check["ok"] for check in llm_checks},
+        "mongo_connected": mongo_connected,
+        "startup_seconds": round(time.perf_counter() - start, 3)
+    })
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application startup/shutdown"""
+    # Run checks in the background so the server accepts requests at once;
+    # /health reports readiness until they finish
+    app.state.readiness = {"ready": False}
+    app.state.startup_task = asyncio.create_task(run_startup_checks(app))
+    yield
+    app.state.startup_task.cancel()
+    # Release pooled LLM and MongoDB connections and worker processes
+    await llm.aclose()
+    mongo_tool.close()
+    python_tool.close()
+    visualize_tool.close()
+
 
 app = FastAPI(
     title="Data Analysis Agent API",
     description="AI agent for data analysis with MongoDB, Python, and web search capabilities",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -24,8 +81,8 @@ app.add_middleware(
 )
 
 # Serve static files (for images)
-os.makedirs("static", exist_ok=True)
-app.mount("/static", StaticFiles(directory="static"), name="static")
+os.makedirs(settings.static_dir, exist_ok=True)
+app.mount("/static", StaticFiles(directory=settings.static_dir), name="static")
 
 
 class Message(BaseModel):
@@ -34,14 +91,20 @@ class Message(BaseModel):
 
 
 class ChatRequest(BaseModel):
-    messages: List[Message]
+    # Omit messages to keep the history server-side (session mode)
+    messages: Optional[List[Message]] = None
     user_message: Optional[str] = None
+    session_id: Optional[str] = None
+    # "react" (default) or "plan" (plan-and-execute)
+    mode: Optional[str] = None
 
 
 class ChatResponse(BaseModel):
     messages: List[Message]
-    artifacts: List[str] = []
+    artifacts: List[str] = []  # image URLs under /static
+    context: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
+    session_id: Optional[str] = None
 
 
 @app.get("/")
@@ -57,14 +120,96 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
+    readiness = app.state.readiness
+    if readiness.get("error"):
+        status = "failed"
+    elif not readiness["ready"]:
+        status = "starting"
+    elif all(readiness["llm_endpoints"].values()):
+        status = "healthy"
+    else:
+        status = "degraded"
+    
     return {
-        "status": "healthy",
+        "status": status,
+        "ready": readiness["ready"],
         "llm_provider": settings.llm_provider,
+        "llm_endpoints": readiness.get("llm_endpoints"),
         "mongo_connected": agent.tools["mongo"].connected,
-        "web_search_available": agent.tools["web_search"].available
+        "web_search_available": agent.tools["web_search"].available,
+        "startup_seconds": readiness.get("startup_seconds"),
+        "startup_error": readiness.get("error")
     }
 
 
+def _overloaded(error: OverloadedError) -> HTTPException:
+    """503 response telling clients when to retry"""
+    return HTTPException(
+        status_code=503,
+        detail=f"Server busy: {error}. Please retry shortly.",
+        headers={"Retry-After": str(max(1, round(error.retry_after)))}
+    )
+
+
+def _split_request(request: ChatRequest) -> Tuple[str, List[Dict[str, str]]]:
+    """Extract the latest user message and prior history from a chat request"""
+    # Extract conversation history
+    conversation_history = [
+        {"role": msg.role, "content": msg.content}
+        for msg in request.messages
+    ] if request.messages else []
+    
+    # Get user message
+    if request.user_message:
+        user_message = request.user_message
+    elif conversation_history and conversation_history[-1]["role"] == "user":
+        user_message = conversation_history[-1]["content"]
+        conversation_history = conversation_history[:-1]
+    else:
+        raise HTTPException(status_code=400, detail="No user message provided")
+    
+    return user_message, conversation_history
+
+
+async def _start_turn(request: ChatRequest) -> Tuple[str, List[Dict[str, str]], Optional[str]]:
+    """User message, history and session id (None in stateless mode)"""
+    if request.mode is not None and request.mode not in agent.MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown mode: {request.mode}. Use one of: {', '.join(agent.MODES)}"
+        )
+    
+    if request.messages is not None:
+        return (*_split_request(request), None)
+    
+    if not request.user_message:
+        raise HTTPException(status_code=400, detail="No user message provided")
+    
+    if not request.session_id:
+        return request.user_message, [], new_session_id()
+    
+    history = await session_store.load(request.session_id)
+    if history is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return request.user_message, history, request.session_id
+
+
+async def _finish_turn(
+    result: Dict[str, Any],
+    history: List[Dict[str, str]],
+    session_id: Optional[str]
+) -> Dict[str, Any]:
+    """In session mode, save the turn and reply with only its new messages"""
+    if session_id is None:
+        return result
+    
+    # Skip the system prompt and the history the agent was given
+    new_messages = result["messages"][len(history) + 1:]
+    if not result.get("error"):
+        await session_store.append(session_id, new_messages)
+    return {**result, "messages": new_messages, "session_id": session_id}
+
+
 @app.post("/agent/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     """
@@ -73,25 +218,19 @@ async def chat(request: ChatRequest):
     Send either:
     - messages: Full conversation history
     - user_message: Just the latest message (for new conversations)
+    
+    Or, to keep the history on the server, omit messages and send
+    user_message plus the session_id of an earlier response (none for a new
+    session). The response then carries only the turn's new messages.
     """
     try:
-        # Extract conversation history
-        conversation_history = [
-            {"role": msg.role, "content": msg.content}
-            for msg in request.messages
-        ] if request.messages else []
-        
-        # Get user message
-        if request.user_message:
-            user_message = request.user_message
-        elif conversation_history and conversation_history[-1]["role"] == "user":
-            user_message = conversation_history[-1]["content"]
-            conversation_history = conversation_history[:-1]
-        else:
-            raise HTTPException(status_code=400, detail="No user message provided")
+        user_message, conversation_history, session_id = await _start_turn(request)
         
         # Run agent
-        result = await agent.run(user_message, conversation_history)
+        result = await agent.run(
+            user_message, conversation_history, request.mode, session_id
+        )
+        result = await _finish_turn(result, conversation_history, session_id)
         
         # Convert messages back to Pydantic models
         messages = [Message(**msg) for msg in result["messages"]]
@@ -99,13 +238,93 @@ async def chat(request: ChatRequest):
         return ChatResponse(
             messages=messages,
             artifacts=result.get("artifacts", []),
-            error=result.get("error")
+            context=result.get("context"),
+            error=result.get("error"),
+            session_id=result.get("session_id")
         )
         
+    except HTTPException:
+        raise
+    except OverloadedError as e:
+        raise _overloaded(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/agent/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Chat with the agent, streaming Server-Sent Events
+    
+    Accepts the same body as /agent/chat. Emits token, tool_start, tool_end,
+    artifact and done events; the done event carries the same fields as the
+    /agent/chat response.
+    """
+    user_message, conversation_history, session_id = await _start_turn(request)
+    
+    # Fail fast before the stream starts if no endpoint can take the request
+    if llm.saturated:
+        raise _overloaded(OverloadedError("All LLM endpoints are overloaded"))
+    
+    async def event_stream():
+        try:
+            async for event in agent.run_stream(
+                user_message, conversation_history, request.mode, session_id
+            ):
+                if event["type"] == "done":
+                    event = await _finish_turn(event, conversation_history, session_id)
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'type': 'error', 'error': str(e)})}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/metrics")
+async def metrics():
+    """Cache and performance counters"""
+    return {
+        "llm_cache": llm.cache.stats() if llm.cache is not None else None,
+        "llm_endpoints": llm.router.stats(),
+        "llm_limiters": {
+            endpoint.name: endpoint.limiter.stats() for endpoint in llm.endpoints
+        },
+        "singleflight": {
+            "llm": llm.singleflight.stats(),
+            "tools": agent.singleflight.stats()
+        },
+        "tool_cache": agent.tool_cache.stats() if agent.tool_cache else None,
+        "python_workers": python_tool.pool.stats(),
+        "python_sessions": python_tool.kernels.stats() if python_tool.kernels else None,
+        "chart_cache": visualize_tool.cache.stats() if visualize_tool.cache is not None else None,
+        "artifacts": agent.artifacts.stats(),
+        "sessions": session_store.stats()
+    }
+
+
+@app.get("/artifacts/{artifact_id}")
+async def get_artifact(artifact_id: str):
+    """Fetch a tool artifact referenced in an observation"""
+    artifact = agent.artifacts.get(artifact_id)
+    if artifact is None:
+        raise HTTPException(status_code=404, detail="Artifact not found or expired")
+    
+    return artifact["data"]
+
+
+@app.get("/sessions/{session_id}/variables")
+async def session_variables(session_id: str):
+    """Variables alive in a session's Python kernel"""
+    variables = await python_tool.variables(session_id)
+    if variables is None:
+        raise HTTPException(status_code=404, detail="No Python kernel for this session")
+    return {"session_id": session_id, "variables": variables}
+
+
 @app.get("/tools")
 async def list_tools():
     """List available tools"""
@@ -120,6 +339,17 @@ async def list_tools():
     }
 
 
+@app.delete("/tools/cache")
+async def invalidate_tool_cache(tool: Optional[str] = None):
+    """Drop cached tool results, e.g. after the underlying data changed
+    
+    Pass ?tool=mongo to invalidate a single tool.
+    """
+    if agent.tool_cache is None:
+        return {"invalidated": 0}
+    return {"invalidated": agent.tool_cache.invalidate(tool)}
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,68 @@
+"""
+Benchmark: server CPU per chart, image rendering vs Vega-Lite spec
+
+Builds the same charts with render_chart() (matplotlib to PNG, the work
+of a render process) and with chart_spec() (validate and serialize a
+Vega-Lite spec for the browser), and reports the CPU time and file size
+per chart: small charts of every type, then long line and scatter series
+that both modes downsample.
+
+Run from the backend directory:
+    python -m benchmarks.bench_chart_output [charts] [points]
+"""
+
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.bench_render import make_specs
+from tools.visualize import chart_spec, render_chart
+
+
+def cpu_per_chart(build, specs, figures):
+    """Mean CPU seconds and file bytes per chart"""
+    start = time.process_time()
+    results = [build(spec, figures) for spec in specs]
+    elapsed = time.process_time() - start
+    failures = [r["error"] for r in results if not r.get("success")]
+    assert not failures, failures
+    size = sum(r["image"]["bytes"] for r in results) / len(results)
+    return elapsed / len(specs), size
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    points = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+    rng = np.random.default_rng(0)
+    walk = {
+        "x": list(range(points)),
+        "y": np.cumsum(rng.standard_normal(points)).tolist(),
+    }
+    batches = (
+        (f"{count} small charts", make_specs(count)),
+        (f"line, {points:,} points", [{"type": "line", "data": walk}] * 4),
+        (f"scatter, {points:,} points", [{"type": "scatter", "data": walk}] * 4),
+    )
+
+    with tempfile.TemporaryDirectory() as directory:
+        figures = {"directory": directory, "format": "png", "dpi": 100}
+        # Fonts and caches load on the first render
+        render_chart(batches[0][1][0], figures)
+        chart_spec(batches[0][1][0], figures)
+
+        print(f"{'charts':<26} {'mode':<6} {'CPU/chart':>10} {'file':>9}")
+        for name, specs in batches:
+            timings = {}
+            for mode, build in (("png", render_chart), ("vega", chart_spec)):
+                timings[mode], size = cpu_per_chart(build, specs, figures)
+                print(
+                    f"{name:<26} {mode:<6} {timings[mode] * 1000:8.1f}ms "
+                    f"{size / 1024:7.1f}KB"
+                )
+            print(f"{'':<26} {'ratio':<6} {timings['png'] / timings['vega']:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark: downsampling large series in the visualize tool
+
+Times the NumPy LTTB and density binning on a 1M-point random walk, then
+the full render of line and scatter charts with and without
+downsampling. LTTB is first checked against a straightforward
+pure-Python implementation on a smaller series.
+
+Run from the backend directory:
+    python -m benchmarks.bench_downsample [points]
+"""
+
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from tools.downsample import density_grid, lttb
+from tools.visualize import render_chart
+
+MAX_POINTS = 2000
+
+
+def reference_lttb(x, y, n_out):
+    """Textbook LTTB, one point at a time"""
+    n = len(x)
+    bucket_size = (n - 2) / (n_out - 2)
+    selected = [0]
+    a = 0
+    for i in range(n_out - 2):
+        start = int(i * bucket_size) + 1
+        stop = int((i + 1) * bucket_size) + 1
+        next_start = stop
+        next_stop = min(int((i + 2) * bucket_size) + 1, n - 1)
+        if i == n_out - 3:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+        else:
+            avg_x = sum(x[next_start:next_stop]) / (next_stop - next_start)
+            avg_y = sum(y[next_start:next_stop]) / (next_stop - next_start)
+        best, best_area = start, -1.0
+        for j in range(start, stop):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        a = best
+    selected.append(n - 1)
+    return selected
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    points = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rng = np.random.default_rng(0)
+    x = np.arange(points, dtype=np.float64)
+    y = np.cumsum(rng.standard_normal(points))
+
+    # Bucket boundaries are computed the same way when n - 2 is a
+    # multiple of n_out - 2
+    small_n = 10_002
+    expected = reference_lttb(x[:small_n].tolist(), y[:small_n].tolist(), 502)
+    assert lttb(x[:small_n], y[:small_n], 502).tolist() == expected
+
+    print(f"{points:,} points, downsampled above {MAX_POINTS}")
+    elapsed, selected = timed(lttb, x, y, MAX_POINTS)
+    print(f"{'lttb':<34} {elapsed * 1000:8.1f}ms -> {len(selected)} points")
+    elapsed, _ = timed(density_grid, x, y)
+    print(f"{'density_grid':<34} {elapsed * 1000:8.1f}ms")
+
+    # The tool receives JSON lists
+    data = {"x": x.tolist(), "y": y.tolist()}
+    with tempfile.TemporaryDirectory() as directory:
+        figures = {"directory": directory}
+        # Fonts and caches load on the first render
+        render_chart({"type": "line", "data": {"x": [0, 1], "y": [0, 1]}}, figures)
+        for chart_type in ("line", "scatter"):
+            spec = {"type": chart_type, "data": data, "title": "Random walk"}
+            modes = [("downsampled", MAX_POINTS, "bins")]
+            if chart_type == "scatter":
+                modes.append(("downsampled, hexbin", MAX_POINTS, "hexbin"))
+            modes.append(("every point", points + 1, "bins"))
+            for name, max_points, density in modes:
+                elapsed, result = timed(
+                    render_chart, spec, figures, max_points, density
+                )
+                assert result.get("success"), result
+                label = f"render {chart_type}, {name}"
+                print(
+                    f"{label:<34} {elapsed * 1000:8.1f}ms "
+                    f"({result['image']['bytes'] // 1024} KB)"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark: N parallel OpenAI-compatible chats should take about as long as one
+
+Runs against a local stub that takes DELAY seconds per completion. The
+synchronous SDK (previous behaviour) serializes every call on the event loop;
+the AsyncOpenAI client used by LLMProvider overlaps them. The guarantee is
+checked by tests/test_llm_concurrency.py; this prints the timings.
+
+Run from the backend directory:
+    python -m benchmarks.bench_llm_concurrency [parallel_chats]
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+from openai import OpenAI
+
+from benchmarks.stub_server import StubLLMServer
+
+DELAY = 0.5
+MESSAGES = [{"role": "user", "content": "monthly revenue by region"}]
+
+
+async def blocking_sdk(base_url: str, n: int) -> float:
+    """Previous behaviour: sync OpenAI client called from async code"""
+    client = OpenAI(api_key="stub", base_url=base_url)
+
+    async def one():
+        client.chat.completions.create(model="stub-model", messages=MESSAGES)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(n)))
+    return time.perf_counter() - start
+
+
+async def async_provider(provider, n: int) -> float:
+    # Distinct messages, so identical-call coalescing does not hide the cost
+    messages = [[{"role": "user", "content": f"question {i}"}] for i in range(n)]
+    start = time.perf_counter()
+    await asyncio.gather(*(provider.chat(m) for m in messages))
+    elapsed = time.perf_counter() - start
+    await provider.aclose()
+    return elapsed
+
+
+def main():
+    parallel = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    server = StubLLMServer(delay=DELAY).start()
+
+    os.environ["LLM_PROVIDER"] = "groq"
+    os.environ["GROQ_API_KEY"] = "stub"
+    os.environ["GROQ_BASE_URL"] = f"{server.url}/v1"
+    os.environ["LLM_CACHE_ENABLED"] = "false"
+    os.environ["LLM_INITIAL_CONCURRENCY"] = str(parallel)
+    from core.llm import LLMProvider
+
+    try:
+        blocking = asyncio.run(blocking_sdk(f"{server.url}/v1", parallel))
+        concurrent = asyncio.run(async_provider(LLMProvider(), parallel))
+    finally:
+        server.stop()
+
+    print(f"{parallel} parallel chats, {DELAY:.2f} s per completion")
+    print(f"sync SDK on event loop: {blocking:6.2f} s")
+    print(f"AsyncOpenAI (pooled):   {concurrent:6.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark: per-call httpx client vs. the shared pooled client in LLMProvider
+
+Run from the backend directory:
+    python -m benchmarks.bench_llm_pool [iterations]
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import httpx
+
+from benchmarks.stub_server import StubLLMServer
+
+MESSAGES = [{"role": "user", "content": "monthly revenue by region"}]
+
+
+async def per_call_client(url: str, n: int) -> list:
+    """Previous behaviour: a brand-new AsyncClient for every request"""
+    payload = {"model": "stub-model", "messages": MESSAGES, "stream": False}
+    timings = []
+    for _ in range(n):
+        start = time.perf_counter()
+        async with httpx.AsyncClient(timeout=180.0) as client:
+            response = await client.post(f"{url}/api/chat", json=payload)
+            response.raise_for_status()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+async def pooled_client(provider, n: int) -> list:
+    timings = []
+    for _ in range(n):
+        start = time.perf_counter()
+        await provider.chat(MESSAGES)
+        timings.append(time.perf_counter() - start)
+    await provider.aclose()
+    return timings
+
+
+def report(name: str, timings: list):
+    ms = sorted(t * 1000 for t in timings)
+    p95 = ms[int(len(ms) * 0.95) - 1]
+    print(
+        f"{name:<18} mean={statistics.mean(ms):7.3f} ms  "
+        f"p50={statistics.median(ms):7.3f} ms  p95={p95:7.3f} ms"
+    )
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    server = StubLLMServer().start()
+
+    # Point the provider at the stub before core.llm builds its global instance
+    os.environ["LLM_PROVIDER"] = "ollama"
+    os.environ["OLLAMA_BASE_URL"] = server.url
+    os.environ["OLLAMA_MODEL"] = "stub-model"
+    from core.llm import LLMProvider
+
+    try:
+        baseline = asyncio.run(per_call_client(server.url, iterations))
+        pooled = asyncio.run(pooled_client(LLMProvider(), iterations))
+    finally:
+        server.stop()
+
+    print(f"{iterations} sequential chat calls against {server.url}")
+    report("per-call client", baseline)
+    report("pooled client", pooled)
+    speedup = statistics.mean(baseline) / statistics.mean(pooled)
+    print(f"speedup: {speedup:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
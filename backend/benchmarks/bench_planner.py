@@ -0,0 +1,138 @@
+"""
+Benchmark: ReAct loop vs. plan-and-execute mode
+
+Replays a recorded conversation with a fake LLM and fake tools that only
+sleep, so the numbers show orchestration cost: LLM round trips and how
+much tool work overlaps. The question needs a Mongo query and a web search
+(independent) plus a Python step that uses the query result.
+
+Run from the backend directory:
+    python -m benchmarks.bench_planner [llm_latency_seconds] [tool_latency_seconds]
+"""
+
+import asyncio
+import json
+import sys
+import time
+
+from core.agent import DataAgent
+from core.context import is_observation
+
+QUESTION = "Compare revenue by region and find recent news about our category"
+
+MONGO = {"collection": "events", "pipeline": [{"$group": {"_id": "$region"}}]}
+SEARCH = {"query": "analytics software market news", "count": 5}
+PYTHON = {"code": "print(sorted(rows, key=lambda r: -r['revenue']))"}
+ANSWER = "North leads revenue; the category is growing according to recent news."
+
+# Recorded model outputs per ReAct step (index = observations so far)
+REACT_SERIAL = [
+    {"action": "mongo", "input": MONGO},
+    {"action": "web_search", "input": SEARCH},
+    {"action": "python", "input": PYTHON},
+]
+REACT_PARALLEL = [
+    {
+        "actions": [
+            {"action": "mongo", "input": MONGO},
+            {"action": "web_search", "input": SEARCH},
+        ]
+    },
+    {"action": "python", "input": PYTHON},
+]
+PLAN = {
+    "steps": [
+        {"id": "s1", "action": "mongo", "input": MONGO},
+        {"id": "s2", "action": "web_search", "input": SEARCH},
+        {
+            "id": "s3",
+            "action": "python",
+            "input": {"code": "rows = {{s1.results}}\n" + PYTHON["code"]},
+        },
+    ]
+}
+
+
+class FakeLLM:
+    """Replays recorded outputs after a fixed latency"""
+
+    context_tokens = 8192
+
+    def __init__(self, script, latency: float):
+        self.script = script
+        self.latency = latency
+        self.calls = 0
+
+    async def chat(self, messages, temperature=None, tools=None) -> str:
+        await asyncio.sleep(self.latency)
+        self.calls += 1
+        if "PLANNING MODE" in messages[0]["content"]:
+            return json.dumps(PLAN)
+        step = sum(1 for msg in messages if is_observation(msg))
+        if step < len(self.script):
+            return json.dumps(self.script[step])
+        return ANSWER
+
+    async def stream_chat(self, messages, temperature=None, tools=None):
+        yield await self.chat(messages, temperature, tools)
+
+
+class FakeTool:
+    def __init__(self, name: str, latency: float, result):
+        self.name = name
+        self.description = name
+        self.input_schema = {"type": "object"}
+        self.latency = latency
+        self.result = result
+        self.calls = 0
+
+    async def execute(self, input_data):
+        await asyncio.sleep(self.latency)
+        self.calls += 1
+        return self.result
+
+
+def make_tools(latency: float):
+    rows = [{"region": r, "revenue": v} for r, v in (("North", 120), ("South", 80))]
+    return {
+        "mongo": FakeTool(
+            "mongo", latency, {"success": True, "count": 2, "results": rows}
+        ),
+        "web_search": FakeTool("web_search", latency, {"success": True, "results": []}),
+        "python": FakeTool("python", latency, {"success": True, "output": "ok\n"}),
+    }
+
+
+async def run_case(mode: str, script, llm_latency: float, tool_latency: float):
+    fake_llm = FakeLLM(script, llm_latency)
+    tools = make_tools(tool_latency)
+    agent = DataAgent(llm_provider=fake_llm, tools=tools)
+
+    start = time.perf_counter()
+    result = await agent.run(QUESTION, mode=mode)
+    elapsed = time.perf_counter() - start
+
+    assert result["messages"][-1]["content"] == ANSWER, result["messages"][-1]
+    return elapsed, fake_llm.calls, sum(tool.calls for tool in tools.values())
+
+
+def main():
+    llm_latency = float(sys.argv[1]) if len(sys.argv) > 1 else 0.5
+    tool_latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    cases = [
+        ("react, one tool per step", "react", REACT_SERIAL),
+        ("react, parallel steps", "react", REACT_PARALLEL),
+        ("plan-and-execute", "plan", []),
+    ]
+
+    print(f"LLM latency {llm_latency:.2f}s, tool latency {tool_latency:.2f}s")
+    print(f"{'mode':<26} {'wall':>8} {'LLM calls':>10} {'tool calls':>11}")
+    for name, mode, script in cases:
+        elapsed, llm_calls, tool_calls = asyncio.run(
+            run_case(mode, script, llm_latency, tool_latency)
+        )
+        print(f"{name:<26} {elapsed:7.2f}s {llm_calls:>10} {tool_calls:>11}")
+
+
+if __name__ == "__main__":
+    main()
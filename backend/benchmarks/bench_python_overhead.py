@@ -0,0 +1,112 @@
+"""
+Benchmark: per-call overhead of the python tool for a trivial snippet
+
+Measures, in this process, the setup work done around exec() for every
+call: the keyword scan, building the globals and compiling the source.
+"before" replays the original per-call path (lowercase scan per keyword,
+import block, globals dict built from scratch, source compiled by exec);
+"after" uses the precompiled keyword pattern, the prebuilt globals
+template and the compiled-code cache. A worker pool round trip is also
+timed, for scale.
+
+Run from the backend directory:
+    python -m benchmarks.bench_python_overhead [calls]
+"""
+
+import asyncio
+import sys
+import time
+
+from tools.python_sandbox import PythonWorkerPool, _Interpreter
+from tools.python_tool import PythonTool
+
+SNIPPET = "total = sum(range(10))\nprint(total)"
+
+DANGEROUS_KEYWORDS = PythonTool.DANGEROUS_KEYWORDS
+
+
+def before(code: str):
+    """The original per-call setup"""
+    for keyword in DANGEROUS_KEYWORDS:
+        if keyword in code.lower():
+            return
+    safe_globals = {"__builtins__": __builtins__, "print": print}
+    import pandas as pd
+    import numpy as np
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    from datetime import datetime, timedelta
+    import math
+    import statistics
+    import json
+    import collections
+    import re
+
+    safe_globals.update(
+        {
+            "pd": pd,
+            "np": np,
+            "plt": plt,
+            "sns": sns,
+            "datetime": datetime,
+            "timedelta": timedelta,
+            "math": math,
+            "statistics": statistics,
+            "json": json,
+            "collections": collections,
+            "re": re,
+        }
+    )
+    exec(code, safe_globals)
+
+
+def after(interpreter: _Interpreter, code: str):
+    if PythonTool.FORBIDDEN.search(code):
+        return
+    exec(interpreter.compile(code), interpreter.namespace())
+
+
+def per_call(fn, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls
+
+
+async def pool_round_trip(calls: int) -> float:
+    pool = PythonWorkerPool(size=1)
+    await pool.start()
+    try:
+        await pool.run(SNIPPET, timeout=10)
+        start = time.perf_counter()
+        for _ in range(calls):
+            await pool.run(SNIPPET, timeout=10)
+        return (time.perf_counter() - start) / calls
+    finally:
+        pool.close()
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    interpreter = _Interpreter()
+    # Output is irrelevant here
+    silent = SNIPPET.replace("print(total)", "total")
+
+    print(f"{calls} calls of a trivial snippet")
+    print(f"{'path':<34} {'per call':>10}")
+    for name, fn in (
+        ("before: scan + imports + compile", lambda: before(silent)),
+        ("after: regex + template + cache", lambda: after(interpreter, silent)),
+        (
+            "after, full execute() in worker",
+            lambda: interpreter.execute(SNIPPET, interpreter.namespace()),
+        ),
+    ):
+        print(f"{name:<34} {per_call(fn, calls) * 1e6:8.1f}us")
+
+    round_trip = asyncio.run(pool_round_trip(min(calls, 500)))
+    print(f"{'worker pool round trip':<34} {round_trip * 1e6:8.1f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark: concurrent chart rendering with the visualize engine
+
+Renders a batch of distinct charts serially, then the same batch from a
+thread pool and from a process pool, and reports the throughput of each
+along with how many concurrent renders differ from their serial render
+(charts are content-addressed, so equal URLs mean equal files). The
+isolation itself is checked by tests/test_render_isolation.py.
+
+Run from the backend directory:
+    python -m benchmarks.bench_render [charts] [workers]
+"""
+
+import multiprocessing
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from tools.visualize import render_chart
+
+TYPES = ("line", "bar", "scatter", "pie")
+
+
+def make_specs(count: int):
+    """Distinct charts of every type"""
+    specs = []
+    for i in range(count):
+        chart_type = TYPES[i % len(TYPES)]
+        n = 8 + i % 24
+        if chart_type == "pie":
+            data = {
+                "labels": [f"slice {k}" for k in range(5)],
+                "values": [(i + k) % 7 + 1 for k in range(5)],
+            }
+        elif chart_type == "bar":
+            data = {
+                "x": [f"category {k}" for k in range(n)],
+                "y": [(i * k) % 17 for k in range(n)],
+            }
+        else:
+            data = {"x": list(range(n)), "y": [(i + k * k) % 23 for k in range(n)]}
+        specs.append(
+            {
+                "type": chart_type,
+                "data": data,
+                "title": f"Chart {i}",
+                "xlabel": "x",
+                "ylabel": "y",
+            }
+        )
+    return specs
+
+
+def render_all(specs, figures, executor=None):
+    start = time.perf_counter()
+    if executor is None:
+        results = [render_chart(spec, figures) for spec in specs]
+    else:
+        futures = [executor.submit(render_chart, spec, figures) for spec in specs]
+        results = [future.result() for future in futures]
+    return time.perf_counter() - start, results
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    specs = make_specs(count)
+
+    with tempfile.TemporaryDirectory() as directory:
+        figures = {"directory": directory, "format": "png", "dpi": 100}
+        # Warm up fonts and caches outside the timings
+        render_chart(specs[0], figures)
+
+        elapsed, expected = render_all(specs, figures)
+        failures = [r["error"] for r in expected if not r.get("success")]
+        assert not failures, failures
+        expected_urls = [r["image"]["url"] for r in expected]
+
+        print(f"{count} charts, {workers} workers")
+        print(f"{'mode':<10} {'wall':>8} {'charts/s':>9} {'mismatched':>11}")
+        print(f"{'serial':<10} {elapsed:7.2f}s {count / elapsed:9.1f} {'-':>11}")
+
+        pools = (
+            ("threads", lambda: ThreadPoolExecutor(max_workers=workers)),
+            (
+                "processes",
+                lambda: ProcessPoolExecutor(
+                    max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+                ),
+            ),
+        )
+        for name, make_pool in pools:
+            with make_pool() as executor:
+                # Start every worker before timing
+                list(executor.map(render_chart, specs[:workers], [figures] * workers))
+                elapsed, results = render_all(specs, figures, executor)
+            mismatched = sum(
+                1
+                for result, url in zip(results, expected_urls)
+                if not result.get("success") or result["image"]["url"] != url
+            )
+            print(f"{name:<10} {elapsed:7.2f}s {count / elapsed:9.1f} {mismatched:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark: import time and time-to-ready of the FastAPI app
+
+Each scenario runs in a fresh interpreter so module-level work is measured
+honestly. Startup checks run in the background, so import time should stay
+flat however slow or unreachable Ollama and MongoDB are; time-to-ready is
+bounded by the slowest check rather than their sum.
+
+Run from the backend directory:
+    python -m benchmarks.bench_startup
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.stub_server import StubLLMServer
+
+# Runs in the child interpreter
+CHILD = """
+import asyncio, json, time
+start = time.perf_counter()
+from app import app
+imported = time.perf_counter() - start
+
+async def ready():
+    async with app.router.lifespan_context(app):
+        await app.state.startup_task
+        return dict(app.state.readiness)
+
+readiness = asyncio.run(ready())
+print(json.dumps({"import": imported, "ready": readiness["startup_seconds"],
+                  "endpoints": readiness["llm_endpoints"],
+                  "mongo": readiness["mongo_connected"]}))
+"""
+
+# Nothing listens on port 1, so connections are refused immediately
+UNREACHABLE = "http://127.0.0.1:1"
+
+
+def run_scenario(ollama_url: str, mongo_uri: str) -> dict:
+    env = dict(
+        os.environ,
+        LLM_PROVIDER="ollama",
+        OLLAMA_BASE_URL=ollama_url,
+        OLLAMA_MODEL="stub-model",
+        MONGO_URI=mongo_uri,
+        LLM_CACHE_BACKEND="memory",
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD], env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    healthy = StubLLMServer().start()
+    slow = StubLLMServer(delay=2.0).start()
+    scenarios = [
+        ("ollama up, mongo unreachable", healthy.url, "mongodb://127.0.0.1:1"),
+        ("ollama unreachable", UNREACHABLE, "mongodb://127.0.0.1:1"),
+        ("ollama slow (2s)", slow.url, "mongodb://127.0.0.1:1"),
+    ]
+
+    try:
+        print(f"{'scenario':<30} {'import':>10} {'ready':>10}  checks")
+        for name, ollama_url, mongo_uri in scenarios:
+            stats = run_scenario(ollama_url, mongo_uri)
+            print(
+                f"{name:<30} {stats['import'] * 1000:8.0f}ms "
+                f"{stats['ready'] * 1000:8.0f}ms  "
+                f"ollama={list(stats['endpoints'].values())} mongo={stats['mongo']}"
+            )
+    finally:
+        healthy.stop()
+        slow.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Local stub LLM server for benchmarks
+Speaks just enough of the Ollama and OpenAI-compatible APIs to drive core/llm.py
+without a real model behind it.
+"""
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    """Answers every chat request with a fixed reply after a fixed delay"""
+
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, body, status=200):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            if self.server.delay:
+                time.sleep(self.server.delay)
+            self._send_json({"models": [{"name": self.server.model}]})
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def _send_stream(self, chunks, content_type):
+        """Write chunks as they are produced; the connection is closed after"""
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for chunk in chunks:
+            self.wfile.write(chunk.encode("utf-8"))
+            self.wfile.flush()
+            if self.server.token_delay:
+                time.sleep(self.server.token_delay)
+        self.close_connection = True
+
+    def _tokens(self):
+        return [word + " " for word in self.server.reply.split(" ")]
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        self.server.request_count += 1
+
+        if self.server.slow_rate and random.random() < self.server.slow_rate:
+            time.sleep(self.server.slow_delay)
+        elif self.server.delay:
+            time.sleep(self.server.delay)
+
+        if self.server.status != 200:
+            self._send_json({"error": "stub failure"}, status=self.server.status)
+            return
+
+        if body.get("stream") and self.path == "/api/chat":
+            lines = [
+                json.dumps(
+                    {"message": {"role": "assistant", "content": t}, "done": False}
+                )
+                + "\n"
+                for t in self._tokens()
+            ]
+            lines.append(json.dumps({"message": {"content": ""}, "done": True}) + "\n")
+            self._send_stream(lines, "application/x-ndjson")
+        elif body.get("stream") and self.path.endswith("/chat/completions"):
+            events = [
+                "data: "
+                + json.dumps(
+                    {
+                        "id": "chatcmpl-stub",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": self.server.model,
+                        "choices": [
+                            {"index": 0, "delta": {"content": t}, "finish_reason": None}
+                        ],
+                    }
+                )
+                + "\n\n"
+                for t in self._tokens()
+            ]
+            events.append("data: [DONE]\n\n")
+            self._send_stream(events, "text/event-stream")
+        elif self.path == "/api/chat":
+            self._send_json(
+                {
+                    "model": self.server.model,
+                    "message": {"role": "assistant", "content": self.server.reply},
+                    "done": True,
+                }
+            )
+        elif self.path.endswith("/chat/completions"):
+            self._send_json(
+                {
+                    "id": "chatcmpl-stub",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": self.server.model,
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {
+                                "role": "assistant",
+                                "content": self.server.reply,
+                            },
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": {
+                        "prompt_tokens": 1,
+                        "completion_tokens": 1,
+                        "total_tokens": 2,
+                    },
+                }
+            )
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+
+class StubLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(
+        self,
+        delay=0.0,
+        reply="ok",
+        model="stub-model",
+        token_delay=0.0,
+        status=200,
+        slow_rate=0.0,
+        slow_delay=0.0,
+    ):
+        super().__init__(("127.0.0.1", 0), StubLLMHandler)
+        self.delay = delay
+        self.status = status  # non-200 makes every chat request fail
+        self.slow_rate = slow_rate  # fraction of requests that take slow_delay
+        self.slow_delay = slow_delay
+        self.token_delay = token_delay
+        self.reply = reply
+        self.model = model
+        self.request_count = 0
+
+    def handle_error(self, request, client_address):
+        # Clients cancelling requests (e.g. lost hedges) are expected
+        pass
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubLLMServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
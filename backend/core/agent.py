@@ -168,10 +168,18 @@
 
 # # Global agent instance
 # agent = DataAgent()
+import asyncio
+import functools
 import json
-from typing import List, Dict, Any, Optional
-from core.llm import llm
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
+from core.llm import FINAL_ANSWER, llm
 from core.config import settings
+from core.artifacts import ArtifactStore, compact_observation
+from core.cache import ToolCache, canonical_hash
+from core.context import ContextManager
+from core.limiter import OverloadedError
+from core.planner import PlanError, execute_plan, parse_plan
+from core.singleflight import SingleFlight
 from tools.python_tool import python_tool
 from tools.mongo_tool import mongo_tool
 from tools.web_search import web_search_tool
@@ -188,6 +196,8 @@ You have access to these tools:
 1. **python** - Execute Python code for data analysis
    - Allowed libraries: pandas, numpy, matplotlib, seaborn, datetime, math, statistics, json, collections, re
    - Use for: calculations, data manipulation, creating charts
+   - Load MongoDB data straight into a DataFrame with mongo_df("events", pipeline=[...]) or mongo_df("events", query={...}) instead of copying query results into code
+   - Variables you define stay available to later python calls in this conversation
    - Input: {"code": "python code here"}
 
 2. **mongo** - Query MongoDB database
@@ -214,7 +224,19 @@ When you need to use a tool, respond with JSON in this exact format:
 }
 ```
 
+To use several tools that don't depend on each other, request them in one step; they run at the same time:
+```json
+{
+  "thought": "I need revenue by region and recent news about our category",
+  "actions": [
+    {"action": "mongo", "input": {"collection": "events", "pipeline": [...]}},
+    {"action": "web_search", "input": {"query": "...", "count": 5}}
+  ]
+}
+```
+
 After receiving tool results, provide your FINAL ANSWER in NATURAL, CONVERSATIONAL LANGUAGE.
+If your output is restricted to JSON, give the final answer as the action {"action": "final_answer", "input": {"answer": "..."}}.
 
 **IMPORTANT GUIDELINES:**
 - After using a tool and getting results, ALWAYS provide a natural language response
@@ -225,19 +247,125 @@ After receiving tool results, provide your FINAL ANSWER in NATURAL, CONVERSATION
 - Cite sources when using web search results
 """
 
-    def __init__(self):
-        self.tools = {
+    PLANNER_PROMPT = """
+**PLANNING MODE**
+
+Do not call tools one at a time. Respond ONLY with a JSON plan of every tool call needed to answer, and nothing else:
+```json
+{
+  "steps": [
+    {"id": "s1", "action": "mongo", "input": {"collection": "events", "pipeline": [...]}},
+    {"id": "s2", "action": "web_search", "input": {"query": "...", "count": 5}},
+    {"id": "s3", "action": "python", "input": {"code": "rows = {{s1.results}}\n..."}, "depends_on": ["s1"]}
+  ]
+}
+```
+- Use {{step_id}} or {{step_id.field}} in an input to use an earlier step's result (e.g. {{s1.results}}, {{s3.output}})
+- Steps without dependencies run at the same time
+- If no tool is needed, respond with {"steps": []}
+"""
+
+    # Selectable per request: step-by-step ReAct, or plan-and-execute
+    MODES = ("react", "plan")
+
+    def __init__(self, llm_provider=None, tools: Dict[str, Any] = None):
+        # Overridable so benchmarks can run against a fake LLM and tools
+        self.llm = llm_provider or llm
+        self.tools = tools or {
             "python": python_tool,
             "mongo": mongo_tool,
             "web_search": web_search_tool,
             "visualize": visualize_tool,
         }
         self.max_iterations = settings.max_iterations
+        # Tool schemas offered to providers with structured output
+        self.tool_specs = None
+        if settings.agent_structured_output:
+            self.tool_specs = [
+                {
+                    "name": tool.name,
+                    "description": tool.description,
+                    "parameters": tool.input_schema,
+                }
+                for tool in self.tools.values()
+            ]
+        self.context = ContextManager(
+            budget=self.llm.context_tokens - settings.context_reserve_tokens,
+            keep_last_turns=settings.context_keep_last_turns,
+            policy=settings.context_policy,
+            observation_max_chars=settings.context_observation_max_chars,
+        )
+        # Identical concurrent tool calls share one execution
+        self.singleflight = SingleFlight()
+        # Repeated tool calls are answered from cache (None when disabled)
+        self.tool_cache = None
+        if settings.tool_cache_enabled:
+            self.tool_cache = ToolCache(
+                settings.tool_cache_ttls, max_entries=settings.tool_cache_max_entries
+            )
+        # Images and large results are referenced by ID in observations
+        self.artifacts = ArtifactStore(
+            max_entries=settings.artifact_max_entries, ttl=settings.artifact_ttl
+        )
 
     async def run(
-        self, user_message: str, conversation_history: List[Dict[str, str]] = None
+        self,
+        user_message: str,
+        conversation_history: List[Dict[str, str]] = None,
+        mode: str = None,
+        session_id: str = None,
     ) -> Dict[str, Any]:
-        """Run the agent with ReAct loop"""
+        """Run the agent with ReAct loop (or plan-and-execute, mode="plan")
+
+        Stateful tools (the Python kernel) keep their state per session_id.
+        """
+        result = {}
+        async for event in self._events(
+            user_message, conversation_history, mode, session_id
+        ):
+            if event["type"] == "done":
+                result = {k: v for k, v in event.items() if k != "type"}
+        return result
+
+    async def run_stream(
+        self,
+        user_message: str,
+        conversation_history: List[Dict[str, str]] = None,
+        mode: str = None,
+        session_id: str = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Run the agent, yielding events as they happen
+
+        Event types:
+        - token: a chunk of LLM output for the current iteration
+        - tool_start / tool_end: a tool call began / finished
+        - artifact: an image produced by a tool (url, media type and size)
+        - done: final messages, artifacts and context report (same shape
+          as run())
+
+        Tokens of an iteration that ends in a tool call belong to the tool
+        call JSON, so clients should discard their draft on tool_start.
+        """
+        async for event in self._events(
+            user_message, conversation_history, mode, session_id, stream=True
+        ):
+            yield event
+
+    def _events(
+        self, user_message, conversation_history, mode, session_id, stream=False
+    ):
+        if (mode or settings.agent_mode) == "plan":
+            return self._plan(user_message, conversation_history, stream, session_id)
+        return self._loop(user_message, conversation_history, stream, session_id)
+
+    async def _loop(
+        self,
+        user_message: str,
+        conversation_history: List[Dict[str, str]] = None,
+        stream: bool = False,
+        session_id: str = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """ReAct loop shared by run() and run_stream()"""
         if conversation_history is None:
             conversation_history = []
 
@@ -253,71 +381,360 @@ After receiving tool results, provide your FINAL ANSWER in NATURAL, CONVERSATION
         # Storage for artifacts (images)
         artifacts = []
 
+        # Prompt size report of the latest LLM call
+        context_report = None
+
         # ReAct loop
         for iteration in range(self.max_iterations):
+            # Fit the prompt into the model's context window
+            prompt, context_report = self.context.fit(messages)
+            if context_report["compacted"]:
+                print(
+                    f"Context compacted: {context_report['prompt_tokens_before']} -> "
+                    f"{context_report['prompt_tokens_after']} tokens"
+                )
+
             # Get LLM response
             try:
-                response = await llm.chat(messages)
+                if stream:
+                    chunks = []
+                    async for token in self.llm.stream_chat(
+                        prompt, tools=self.tool_specs
+                    ):
+                        chunks.append(token)
+                        yield {"type": "token", "content": token}
+                    response = "".join(chunks)
+                else:
+                    response = await self.llm.chat(prompt, tools=self.tool_specs)
+            except OverloadedError:
+                # Let the API answer 503 instead of a chat-level error
+                raise
             except Exception as e:
-                return {
+                yield {
+                    "type": "done",
                     "messages": messages
                     + [{"role": "assistant", "content": f"Error: {str(e)}"}],
                     "artifacts": artifacts,
+                    "context": context_report,
                     "error": str(e),
                 }
+                return
 
-            # Check if response contains action (JSON format)
+            # Check if response contains actions (JSON format)
             action_data = self._extract_action(response)
+            actions = self._split_actions(action_data) if action_data else []
+            tool_calls = [call for call in actions if call["action"] != FINAL_ANSWER]
 
-            if action_data:
-                # Execute tool
-                action = action_data.get("action")
-                thought = action_data.get("thought", "")
-                tool_input = action_data.get("input", {})
-
-                if action not in self.tools:
-                    error_msg = f"Unknown tool: {action}. Available tools: {', '.join(self.tools.keys())}"
-                    messages.append({"role": "assistant", "content": response})
-                    messages.append(
-                        {
-                            "role": "user",
-                            "content": f"Error: {error_msg}. Please try again.",
-                        }
-                    )
-                    continue
-
-                # Execute tool
-                tool = self.tools[action]
-                observation = await tool.execute(tool_input)
-
-                # Collect images/artifacts
-                if "images" in observation:
-                    artifacts.extend(observation["images"])
-                elif "image" in observation:
-                    artifacts.append(observation["image"])
-
+            if tool_calls:
                 # Add to conversation
                 messages.append({"role": "assistant", "content": response})
 
-                # Create observation message with instruction to respond naturally
-                obs_text = f"""Tool '{action}' result:
-{json.dumps(observation, indent=2)}
-
-Now provide a NATURAL LANGUAGE response to the user. Do NOT use JSON format. 
-Explain the findings in a clear, conversational way. If these are search results, 
-format them nicely with bullet points and summaries."""
+                # Run every tool of the step concurrently
+                if len(tool_calls) > settings.agent_max_actions_per_step:
+                    print(
+                        f"Step requested {len(tool_calls)} tools, running the first "
+                        f"{settings.agent_max_actions_per_step}"
+                    )
+                    tool_calls = tool_calls[: settings.agent_max_actions_per_step]
+                for call in tool_calls:
+                    if call["action"] in self.tools:
+                        yield {
+                            "type": "tool_start",
+                            "tool": call["action"],
+                            "thought": call["thought"],
+                            "input": call["input"],
+                        }
 
-                messages.append({"role": "user", "content": obs_text})
+                summaries = [None] * len(tool_calls)
+                tasks = [
+                    asyncio.ensure_future(self._run_tool(index, call, session_id))
+                    for index, call in enumerate(tool_calls)
+                ]
+                try:
+                    for next_done in asyncio.as_completed(tasks):
+                        index, observation = await next_done
+                        action = tool_calls[index]["action"]
+                        if action in self.tools:
+                            yield {
+                                "type": "tool_end",
+                                "tool": action,
+                                "success": "error" not in observation,
+                            }
+
+                        # Move images and big results to the artifact store
+                        summaries[index], images = compact_observation(
+                            observation, self.artifacts, settings.observation_head_rows
+                        )
+                        for image in images:
+                            artifacts.append(image["url"])
+                            yield {"type": "artifact", **image}
+                finally:
+                    # The client went away mid-step
+                    for task in tasks:
+                        task.cancel()
+
+                # One observation message with every result, in request order
+                messages.append(
+                    {
+                        "role": "user",
+                        "content": self._observation_text(
+                            [call["action"] for call in tool_calls], summaries
+                        ),
+                    }
+                )
+
+            elif actions:
+                # Structured output wraps the final answer in an action
+                tool_input = actions[0]["input"]
+                answer = (
+                    tool_input.get("answer")
+                    if isinstance(tool_input, dict)
+                    else tool_input
+                )
+                messages.append(
+                    {
+                        "role": "assistant",
+                        "content": answer or actions[0]["thought"] or response,
+                    }
+                )
+                break
 
             else:
                 # No action detected - this is the final answer
                 messages.append({"role": "assistant", "content": response})
                 break
 
-        return {"messages": messages, "artifacts": artifacts}
+        yield {
+            "type": "done",
+            "messages": messages,
+            "artifacts": artifacts,
+            "context": context_report,
+        }
+
+    async def _plan(
+        self,
+        user_message: str,
+        conversation_history: List[Dict[str, str]] = None,
+        stream: bool = False,
+        session_id: str = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Plan-and-execute: one LLM call plans every tool call as a DAG,
+        the plan runs with maximum parallelism, one more call answers
+
+        Falls back to the ReAct loop when the plan is unusable or empty.
+        """
+        history = conversation_history or []
+        messages = [{"role": "system", "content": self.SYSTEM_PROMPT}]
+        messages.extend(history)
+        messages.append({"role": "user", "content": user_message})
+
+        # Plan (not streamed: the plan is JSON, not text for the user)
+        planning = [
+            {"role": "system", "content": self.SYSTEM_PROMPT + self.PLANNER_PROMPT}
+        ] + messages[1:]
+        prompt, context_report = self.context.fit(planning)
+        try:
+            plan_text = await self.llm.chat(prompt)
+            steps = parse_plan(plan_text, self.tools.keys())
+        except OverloadedError:
+            raise
+        except PlanError as e:
+            print(f"Unusable plan ({e}), falling back to ReAct")
+            steps = []
+        except Exception as e:
+            yield {
+                "type": "done",
+                "messages": messages
+                + [{"role": "assistant", "content": f"Error: {str(e)}"}],
+                "artifacts": [],
+                "context": context_report,
+                "error": str(e),
+            }
+            return
+
+        if not steps:
+            async for event in self._loop(user_message, history, stream, session_id):
+                yield event
+            return
+
+        # Execute the plan
+        artifacts = []
+        summaries = {}
+        run_step = functools.partial(self._run_step, session_id=session_id)
+        async for event in execute_plan(steps, run_step):
+            step = event["step"]
+            if event["type"] == "start":
+                yield {
+                    "type": "tool_start",
+                    "tool": step["action"],
+                    "thought": f"Plan step {step['id']}",
+                    "input": event["input"],
+                }
+                continue
+
+            observation = event["observation"]
+            yield {
+                "type": "tool_end",
+                "tool": step["action"],
+                "success": "error" not in observation,
+            }
+            summaries[step["id"]], images = compact_observation(
+                observation, self.artifacts, settings.observation_head_rows
+            )
+            for image in images:
+                artifacts.append(image["url"])
+                yield {"type": "artifact", **image}
+
+        messages.append({"role": "assistant", "content": plan_text})
+        messages.append(
+            {
+                "role": "user",
+                "content": self._observation_text(
+                    [step["action"] for step in steps],
+                    [summaries[step["id"]] for step in steps],
+                ),
+            }
+        )
+
+        # Answer from all the results
+        prompt, context_report = self.context.fit(messages)
+        try:
+            if stream:
+                chunks = []
+                async for token in self.llm.stream_chat(prompt):
+                    chunks.append(token)
+                    yield {"type": "token", "content": token}
+                response = "".join(chunks)
+            else:
+                response = await self.llm.chat(prompt)
+        except OverloadedError:
+            raise
+        except Exception as e:
+            yield {
+                "type": "done",
+                "messages": messages
+                + [{"role": "assistant", "content": f"Error: {str(e)}"}],
+                "artifacts": artifacts,
+                "context": context_report,
+                "error": str(e),
+            }
+            return
+
+        messages.append({"role": "assistant", "content": response})
+        yield {
+            "type": "done",
+            "messages": messages,
+            "artifacts": artifacts,
+            "context": context_report,
+        }
+
+    async def _run_step(
+        self, step: Dict[str, Any], tool_input: Dict[str, Any], session_id: str = None
+    ) -> Dict[str, Any]:
+        _, observation = await self._run_tool(
+            0, {"action": step["action"], "input": tool_input}, session_id
+        )
+        return observation
+
+    def _observation_text(
+        self, actions: List[str], summaries: List[Dict[str, Any]]
+    ) -> str:
+        """Observation message with every tool result, in the given order"""
+        results = "\n\n".join(
+            f"Tool '{action}' result:\n"
+            + json.dumps(
+                summary, separators=(",", ":"), ensure_ascii=False, default=str
+            )
+            for action, summary in zip(actions, summaries)
+        )
+
+        # Create observation message with instruction to respond naturally
+        return f"""{results}
+
+Now provide a NATURAL LANGUAGE response to the user. Do NOT use JSON format. 
+Explain the findings in a clear, conversational way. If these are search results, 
+format them nicely with bullet points and summaries."""
+
+    async def _execute_tool(
+        self, action: str, tool_input: Dict[str, Any], session_id: str = None
+    ) -> Dict[str, Any]:
+        """Run a tool, from cache when possible, coalescing identical
+        concurrent calls"""
+        tool = self.tools[action]
+        if session_id and getattr(tool, "stateful", False):
+            # Results depend on the session's state: never cached or shared
+            return await tool.execute(tool_input, session_id=session_id)
+
+        use_cache = self.tool_cache is not None and self.tool_cache.cacheable(action)
+        if use_cache:
+            cached = self.tool_cache.get(action, tool_input)
+            if cached is not None:
+                return cached
+
+        async def execute():
+            result = await tool.execute(tool_input)
+            if use_cache and "error" not in result:
+                self.tool_cache.set(action, tool_input, result)
+            return result
+
+        key = canonical_hash(action, tool_input)
+        return await self.singleflight.do(key, execute)
+
+    async def _run_tool(
+        self, index: int, call: Dict[str, Any], session_id: str = None
+    ) -> Tuple[int, Dict[str, Any]]:
+        """Run one tool call of a step within its timeout; never raises
+
+        Returns the call's index with its observation, so results can be
+        consumed as they complete.
+        """
+        action, tool_input = call["action"], call["input"]
+        if action not in self.tools:
+            return index, {
+                "error": f"Unknown tool: {action}. Available tools: {', '.join(self.tools.keys())}"
+            }
+
+        timeout = settings.tool_timeouts.get(action, settings.tool_timeout)
+        try:
+            return index, await asyncio.wait_for(
+                self._execute_tool(action, tool_input, session_id), timeout
+            )
+        except asyncio.TimeoutError:
+            return index, {"error": f"Tool '{action}' timed out after {timeout:g}s"}
+        except Exception as e:
+            return index, {"error": f"{type(e).__name__}: {str(e)}"}
+
+    def _split_actions(self, action_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Normalize a single action or an "actions" list to a list of calls"""
+        thought = action_data.get("thought", "")
+        items = action_data.get("actions")
+        if not isinstance(items, list):
+            items = [action_data]
+        return [
+            {
+                "action": item.get("action"),
+                "thought": item.get("thought") or thought,
+                "input": item.get("input", {}),
+            }
+            for item in items
+            if isinstance(item, dict)
+        ]
 
     def _extract_action(self, text: str) -> Optional[Dict[str, Any]]:
         """Extract action JSON from LLM response"""
+        # Structured output: the response (or its last line, after streamed
+        # text) is the action object itself
+        stripped = text.strip()
+        for candidate in (stripped, stripped.rsplit("\n", 1)[-1]):
+            if not candidate.startswith("{"):
+                continue
+            try:
+                data = json.loads(candidate)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(data, dict) and ("action" in data or "actions" in data):
+                return data
+
         # Look for JSON blocks
         import re
 
@@ -340,7 +757,7 @@ format them nicely with bullet points and summaries."""
                 json_str = text[start : end + 1]
                 data = json.loads(json_str)
                 # Verify it has required fields
-                if "action" in data:
+                if "action" in data or "actions" in data:
                     return data
         except json.JSONDecodeError:
             pass
@@ -0,0 +1,66 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.cache import LRUCache, canonical_hash
+
+
+class ArtifactStore:
+    """Tool outputs kept out of the prompt, addressed by content hash
+
+    Full result sets live here; the model only sees their IDs and a short
+    description. Entries are evicted LRU/TTL like the LLM cache, so IDs
+    are valid for a limited time.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 3600.0):
+        self._cache = LRUCache(max_entries=max_entries, ttl=ttl)
+
+    def put(self, kind: str, data: Any, **meta: Any) -> Dict[str, Any]:
+        """Store data and return its entry (id, kind, data and metadata)"""
+        artifact_id = f"{kind}_{canonical_hash(kind, data)[:16]}"
+        entry = {"id": artifact_id, "kind": kind, "data": data, **meta}
+        self._cache.set(artifact_id, entry)
+        return entry
+
+    def get(self, artifact_id: str) -> Optional[Dict[str, Any]]:
+        return self._cache.get(artifact_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+
+def compact_observation(
+    observation: Dict[str, Any], store: ArtifactStore, head_rows: int = 20
+) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """Split a tool observation into a prompt-sized summary and artifacts
+
+    Images ("image"/"images", already saved as static files by the tool)
+    are reduced to their URL and size, and lists longer than `head_rows`
+    are replaced by their row count, first rows and the artifact holding
+    them all. Returns (summary, image descriptors). The observation
+    itself is not modified (it may be shared).
+    """
+    summary: Dict[str, Any] = {}
+    images: List[Dict[str, Any]] = []
+
+    for key, value in observation.items():
+        if key in ("image", "images"):
+            images.extend(value if isinstance(value, list) else [value])
+            summary["images"] = [
+                {
+                    "url": image["url"],
+                    "width": image["width"],
+                    "height": image["height"],
+                }
+                for image in images
+            ]
+        elif isinstance(value, list) and len(value) > head_rows:
+            entry = store.put("rows", value, media_type="application/json")
+            summary[key] = {
+                "rows": len(value),
+                "head": value[:head_rows],
+                "artifact_id": entry["id"],
+            }
+        else:
+            summary[key] = value
+
+    return summary, images
@@ -0,0 +1,382 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+def canonical_hash(*parts: Any) -> str:
+    """Stable hash of JSON-like values (dict key order does not matter)"""
+    payload = json.dumps(
+        parts, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _CacheBase:
+    """Hit/miss accounting shared by cache backends"""
+
+    backend = "base"
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def _record(self, value: Optional[Any]) -> Optional[Any]:
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def aget(self, key: str) -> Optional[Any]:
+        return self.get(key)
+
+    async def aset(self, key: str, value: Any, ttl: Optional[float] = None):
+        self.set(key, value, ttl)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "backend": self.backend,
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class LRUCache(_CacheBase):
+    """In-memory LRU cache with per-entry TTL"""
+
+    backend = "memory"
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600.0):
+        super().__init__()
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return self._record(None)
+
+        value, expires_at = entry
+        if expires_at is not None and expires_at < time.monotonic():
+            del self._data[key]
+            return self._record(None)
+
+        self._data.move_to_end(key)
+        return self._record(value)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl > 0 else None
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        self._data.pop(key, None)
+
+    def delete_prefix(self, prefix: str) -> int:
+        """Delete every key starting with `prefix`; returns how many"""
+        keys = [key for key in self._data if key.startswith(prefix)]
+        for key in keys:
+            del self._data[key]
+        return len(keys)
+
+    def clear(self):
+        self._data.clear()
+
+
+class SQLiteCache(_CacheBase):
+    """Persistent LRU cache backed by a SQLite file (survives restarts)
+
+    Values must be JSON-serializable.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, path: str, max_entries: int = 10000, ttl: float = 86400.0):
+        super().__init__()
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL,
+                last_access REAL NOT NULL
+            )""")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS cache_last_access ON cache (last_access)"
+        )
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return self._record(None)
+
+            value, expires_at = row
+            if expires_at is not None and expires_at < now:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return self._record(None)
+
+            self._conn.execute(
+                "UPDATE cache SET last_access = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+        return self._record(json.loads(value))
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        expires_at = now + ttl if ttl > 0 else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires_at, now),
+            )
+            # Evict least recently used rows beyond the size bound
+            self._conn.execute(
+                "DELETE FROM cache WHERE key IN ("
+                "SELECT key FROM cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+
+    async def aget(self, key: str) -> Optional[Any]:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: Any, ttl: Optional[float] = None):
+        await asyncio.to_thread(self.set, key, value, ttl)
+
+
+class ChartCache(_CacheBase):
+    """Rendered charts keyed by chart spec, backed by their image files
+
+    Maps a canonical hash of the chart spec and render options to the
+    visualize result, whose image lives in `directory`. Entries are evicted
+    least recently used once their files exceed `max_bytes`, and a file is
+    deleted when no entry refers to it any more (identical charts share one
+    content-addressed file). The index is kept in index.json so the cache
+    survives restarts. Thread-safe; file work is meant to run off the event
+    loop.
+    """
+
+    backend = "disk"
+
+    INDEX = "index.json"
+    CHART_SUFFIXES = (".png", ".webp", ".svg", ".vl.json")
+    # Leftovers of interrupted writes
+    TMP_TTL = 3600.0
+
+    def __init__(
+        self, directory: str, max_bytes: int = 256 * 2**20, orphan_ttl: float = 86400.0
+    ):
+        super().__init__()
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.orphan_ttl = orphan_ttl
+        self.evictions = 0
+        self.orphans_removed = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # File name -> number of entries using it
+        self._files: Dict[str, int] = {}
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key(spec: Any, options: Any) -> str:
+        return canonical_hash("chart", spec, options)
+
+    def load(self):
+        """Read the saved index, dropping entries whose file is gone"""
+        try:
+            with open(os.path.join(self.directory, self.INDEX)) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        with self._lock:
+            for key, result in saved:
+                if os.path.exists(self._path(result)):
+                    self._add(key, result)
+            self._evict()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None and not os.path.exists(self._path(result)):
+                # Deleted behind our back
+                self._remove(key)
+                result = None
+            if result is not None:
+                self._entries.move_to_end(key)
+        return self._record(result)
+
+    def set(self, key: str, result: Dict[str, Any]):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+            self._add(key, result)
+            self._evict()
+            self._save()
+
+    def collect_garbage(self) -> int:
+        """Delete chart files no entry refers to once older than orphan_ttl
+        (e.g. python tool figures), and stale temporary files; returns how
+        many"""
+        now = time.time()
+        removed = 0
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return 0
+        for entry in entries:
+            name = entry.name
+            if name.endswith(".tmp"):
+                ttl = self.TMP_TTL
+            elif name.endswith(self.CHART_SUFFIXES) and self.orphan_ttl > 0:
+                ttl = self.orphan_ttl
+            else:
+                continue
+            with self._lock:
+                if name in self._files:
+                    continue
+                try:
+                    if entry.stat().st_mtime + ttl < now:
+                        os.remove(entry.path)
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+        self.orphans_removed += removed
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **super().stats(),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "orphans_removed": self.orphans_removed,
+        }
+
+    @staticmethod
+    def _name(result: Dict[str, Any]) -> str:
+        return result["image"]["url"].rsplit("/", 1)[-1]
+
+    def _path(self, result: Dict[str, Any]) -> str:
+        return os.path.join(self.directory, self._name(result))
+
+    def _add(self, key: str, result: Dict[str, Any]):
+        name = self._name(result)
+        if name not in self._files:
+            self._files[name] = 0
+            self._bytes += result["image"]["bytes"]
+        self._files[name] += 1
+        self._entries[key] = result
+
+    def _remove(self, key: str, delete_file: bool = False):
+        result = self._entries.pop(key)
+        name = self._name(result)
+        self._files[name] -= 1
+        if self._files[name] == 0:
+            del self._files[name]
+            self._bytes -= result["image"]["bytes"]
+            if delete_file:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+
+    def _evict(self):
+        # The newest entry stays even if it alone is over the bound; its
+        # file was just handed out
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            self._remove(next(iter(self._entries)), delete_file=True)
+            self.evictions += 1
+
+    def _save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, self.INDEX)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(list(self._entries.items()), f)
+        os.replace(tmp_path, path)
+
+
+class ToolCache:
+    """Tool results keyed by tool name plus canonical input, with per-tool TTLs
+
+    Only tools with a positive TTL are cached (e.g. not python, whose code
+    may be non-deterministic), and only successful results. Entries share
+    one LRU bound.
+    """
+
+    def __init__(self, ttls: Dict[str, float], max_entries: int = 512):
+        self.ttls = ttls
+        self._cache = LRUCache(max_entries=max_entries)
+        self._tool_stats: Dict[str, Dict[str, int]] = {}
+
+    def cacheable(self, tool: str) -> bool:
+        return self.ttls.get(tool, 0) > 0
+
+    def get(self, tool: str, tool_input: Any) -> Optional[Any]:
+        value = self._cache.get(self._key(tool, tool_input))
+        counters = self._tool_stats.setdefault(tool, {"hits": 0, "misses": 0})
+        counters["misses" if value is None else "hits"] += 1
+        return value
+
+    def set(self, tool: str, tool_input: Any, result: Any):
+        self._cache.set(self._key(tool, tool_input), result, ttl=self.ttls[tool])
+
+    def invalidate(self, tool: Optional[str] = None) -> int:
+        """Drop cached results of one tool (or all); returns how many"""
+        if tool is None:
+            count = len(self._cache)
+            self._cache.clear()
+            return count
+        return self._cache.delete_prefix(f"{tool}:")
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._cache.stats(), "tools": self._tool_stats}
+
+    def _key(self, tool: str, tool_input: Any) -> str:
+        return f"{tool}:{canonical_hash(tool, tool_input)}"
@@ -44,7 +44,7 @@
 
 # settings = Settings()
 from pydantic_settings import BaseSettings
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 
 
 class Settings(BaseSettings):
@@ -52,8 +52,9 @@ class Settings(BaseSettings):
     llm_provider: str = "ollama"  # openai, hf, ollama, groq
 
     # OpenAI
-    # openai_api_key: Optional[str] = None
-    # openai_model: str = "gpt-4"
+    openai_api_key: Optional[str] = None
+    openai_model: str = "gpt-4"
+    openai_base_url: Optional[str] = None  # any OpenAI-compatible endpoint
 
     # Hugging Face
     huggingface_api_key: Optional[str] = None
@@ -66,6 +67,92 @@ class Settings(BaseSettings):
     # Groq
     groq_api_key: Optional[str] = None
     groq_model: str = "llama-3.3-70b-versatile"  # Latest free model
+    groq_base_url: str = "https://api.groq.com/openai/v1"
+
+    # LLM endpoint pool (optional). JSON list; unset fields use the settings
+    # above, e.g. [{"provider": "ollama", "base_url": "http://gpu1:11434"},
+    #              {"provider": "ollama", "base_url": "http://gpu2:11434"}]
+    llm_endpoints: List[Dict[str, Any]] = []
+    llm_hedge_requests: bool = False  # duplicate slow requests to a 2nd endpoint
+    llm_hedge_min_samples: int = 20  # latency samples needed before hedging
+    llm_eject_after_failures: int = 3
+    llm_eject_seconds: float = 30.0
+
+    # Per-endpoint adaptive (AIMD) concurrency limit and retry policy
+    llm_initial_concurrency: int = 4
+    llm_max_concurrency: int = 32
+    llm_max_queue: int = 32  # waiting requests beyond this get HTTP 503
+    llm_queue_timeout: float = 30.0
+    llm_max_retries: int = 3  # retries of 429/503 responses
+    llm_retry_base_delay: float = 0.5
+    llm_retry_max_delay: float = 20.0
+
+    # LLM HTTP client (one pooled client per provider, reused across requests)
+    llm_http2: bool = False  # requires the optional "h2" package
+    llm_max_connections: int = 20
+    llm_max_keepalive_connections: int = 10
+    llm_keepalive_expiry: float = 30.0
+    llm_connect_timeout: float = 10.0
+    ollama_timeout: float = 180.0
+    hf_timeout: float = 60.0
+    openai_timeout: float = 120.0  # OpenAI and Groq
+
+    # LLM response cache
+    llm_cache_enabled: bool = True
+    llm_cache_backend: str = "memory"  # memory, sqlite
+    llm_cache_path: str = "llm_cache.sqlite3"
+    llm_cache_max_entries: int = 1024
+    llm_cache_ttl: float = 3600.0  # seconds, 0 = never expire
+    llm_cache_nonzero_temperature: bool = False  # also cache when temperature > 0
+
+    # Context window: prompt token budget per provider
+    ollama_context_tokens: int = 8192
+    openai_context_tokens: int = 128000
+    groq_context_tokens: int = 32768
+    hf_context_tokens: int = 4096
+    context_reserve_tokens: int = 2000  # left free for the completion
+    context_keep_last_turns: int = 3  # turns always sent verbatim
+    context_policy: str = "summarize"  # summarize, drop
+    context_observation_max_chars: int = 2000  # old tool outputs are cut to this
+
+    # Tool artifacts (images, full result sets) kept out of the prompt
+    artifact_max_entries: int = 256
+    artifact_ttl: float = 3600.0  # seconds
+    observation_head_rows: int = 20  # longer result lists are cut to a head
+
+    # Rendered figures: files under STATIC_DIR/charts, returned as URLs
+    static_dir: str = "static"
+    figure_format: str = "png"  # png, webp, svg
+    figure_dpi: int = 100
+    figure_webp_quality: int = 80
+    chart_output: str = "png"  # png, or vega (spec for the browser to render)
+    render_workers: int = 2  # processes rendering visualize charts
+    chart_max_points: int = 2000  # longer line/scatter series are downsampled
+    chart_density: str = "bins"  # large scatter plots: bins (2D histogram), hexbin
+    # Visualize results by chart spec; hits skip rendering
+    chart_cache_enabled: bool = True
+    chart_cache_max_mb: int = 256  # chart files kept, least recently used evicted
+    chart_orphan_ttl: float = 86400.0  # delete unreferenced files after, 0 = never
+
+    # Python tool: pre-warmed worker processes
+    python_workers: int = 2
+    python_timeout: float = 30.0  # wall clock per execution; hung workers are replaced
+    python_cpu_limit: float = 20.0  # CPU seconds per execution, 0 = unlimited
+    python_memory_limit_mb: int = 2048  # extra address space per run, 0 = unlimited
+    # Per chat session kernels keep variables between calls (0 = disabled)
+    python_max_sessions: int = 16
+    python_session_idle_timeout: float = 600.0  # seconds without calls
+    python_session_memory_mb: int = 1024  # resident; above it the kernel is reset
+    # mongo_df() in the sandbox: documents per cursor batch, rows per call
+    python_mongo_batch_size: int = 1000
+    python_mongo_max_rows: int = 100000
+    python_code_cache_size: int = 256  # compiled snippets kept per worker
+
+    # Server-side conversation sessions
+    session_backend: str = "memory"  # memory, sqlite
+    session_path: str = "sessions.sqlite3"
+    session_max_sessions: int = 1000
+    session_ttl: float = 86400.0  # seconds after the last turn, 0 = never expire
 
     # MongoDB
     mongo_uri: str = "mongodb://localhost:27017"
@@ -81,6 +168,18 @@ class Settings(BaseSettings):
     # Agent Settings
     max_iterations: int = 5
     agent_temperature: float = 0.7
+    # Ask providers for structured tool calls (OpenAI/Groq function calling,
+    # Ollama JSON schema); free-text parsing remains the fallback
+    agent_structured_output: bool = True
+    agent_mode: str = "react"  # react, plan (plan-and-execute); per request too
+    agent_max_actions_per_step: int = 4  # tools run concurrently in one step
+    tool_timeout: float = 60.0  # seconds
+    tool_timeouts: Dict[str, float] = {}  # per tool, e.g. {"web_search": 15}
+
+    # Tool result cache: TTL in seconds per tool; tools not listed are not cached
+    tool_cache_enabled: bool = True
+    tool_cache_max_entries: int = 512
+    tool_cache_ttls: Dict[str, float] = {"mongo": 60.0, "web_search": 3600.0}
 
     class Config:
         env_file = ".env"
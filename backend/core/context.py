@@ -0,0 +1,144 @@
+from typing import Any, Dict, List, Tuple
+
+# Tool observations are fed back to the LLM as user messages with this prefix
+OBSERVATION_PREFIX = "Tool '"
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English/JSON)"""
+    return len(text) // 4 + 1
+
+
+def count_tokens(messages: List[Dict[str, str]]) -> int:
+    """Estimated prompt tokens, including per-message overhead"""
+    return sum(estimate_tokens(msg["content"]) + 4 for msg in messages)
+
+
+def is_observation(message: Dict[str, str]) -> bool:
+    return message["role"] == "user" and message["content"].startswith(
+        OBSERVATION_PREFIX
+    )
+
+
+class ContextManager:
+    """Fit a conversation into a token budget before it is sent to the LLM
+
+    Compaction is applied in stages, stopping as soon as the prompt fits:
+    1. Shrink tool observations outside the last `keep_last_turns` turns
+    2. Summarize (policy="summarize") or drop (policy="drop") older turns
+    3. Shrink observations in recent turns, except the latest message
+    4. Drop the oldest recent turns, always keeping the current one
+
+    A turn starts at a user message that is not a tool observation. The
+    system prompt is always kept. Summaries are extractive (no extra LLM
+    call), so compaction adds no latency.
+    """
+
+    def __init__(
+        self,
+        budget: int,
+        keep_last_turns: int = 3,
+        policy: str = "summarize",
+        observation_max_chars: int = 2000,
+        summary_chars: int = 200,
+    ):
+        self.budget = budget
+        self.keep_last_turns = max(1, keep_last_turns)
+        self.policy = policy
+        self.observation_max_chars = observation_max_chars
+        self.summary_chars = summary_chars
+
+    def fit(
+        self, messages: List[Dict[str, str]]
+    ) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+        """Return the messages to send and a before/after token report"""
+        before = count_tokens(messages)
+        report = {
+            "prompt_tokens_before": before,
+            "prompt_tokens_after": before,
+            "budget": self.budget,
+            "compacted": False,
+        }
+        if before <= self.budget:
+            return messages, report
+
+        system, turns = self._split_turns(messages)
+        old, recent = turns[: -self.keep_last_turns], turns[-self.keep_last_turns :]
+
+        # 1. Shrink old tool observations first
+        old = [[self._shrink(msg) for msg in turn] for turn in old]
+        fitted = self._assemble(system, old, recent)
+
+        # 2. Summarize or drop older turns
+        if count_tokens(fitted) > self.budget and old:
+            summary = self._summarize(old) if self.policy == "summarize" else []
+            old = [summary] if summary else []
+            fitted = self._assemble(system, old, recent)
+
+        # 3. Shrink recent observations, keeping the newest message intact
+        if count_tokens(fitted) > self.budget:
+            latest = recent[-1][-1]
+            recent = [
+                [msg if msg is latest else self._shrink(msg) for msg in turn]
+                for turn in recent
+            ]
+            fitted = self._assemble(system, old, recent)
+
+        # 4. Drop the summary, then the oldest recent turns (never the current one)
+        if count_tokens(fitted) > self.budget:
+            fitted = self._assemble(system, [], recent)
+        while count_tokens(fitted) > self.budget and len(recent) > 1:
+            recent = recent[1:]
+            fitted = self._assemble(system, [], recent)
+
+        report["prompt_tokens_after"] = count_tokens(fitted)
+        report["compacted"] = True
+        return fitted, report
+
+    def _split_turns(self, messages: List[Dict[str, str]]):
+        system = [msg for msg in messages[:1] if msg["role"] == "system"]
+        turns: List[List[Dict[str, str]]] = []
+        for msg in messages[len(system) :]:
+            starts_turn = msg["role"] == "user" and not is_observation(msg)
+            if starts_turn or not turns:
+                turns.append([])
+            turns[-1].append(msg)
+        return system, turns
+
+    def _assemble(self, system, old_turns, recent_turns) -> List[Dict[str, str]]:
+        fitted = list(system)
+        for turn in list(old_turns) + list(recent_turns):
+            fitted.extend(turn)
+        return fitted
+
+    def _shrink(self, message: Dict[str, str]) -> Dict[str, str]:
+        content = message["content"]
+        if not is_observation(message) or len(content) <= self.observation_max_chars:
+            return message
+        dropped = len(content) - self.observation_max_chars
+        return {
+            "role": message["role"],
+            "content": content[: self.observation_max_chars]
+            + f"\n... [truncated {dropped} chars]",
+        }
+
+    def _summarize(self, turns: List[List[Dict[str, str]]]) -> List[Dict[str, str]]:
+        """Collapse old turns into a single extractive summary message"""
+        lines = []
+        for turn in turns:
+            for msg in turn:
+                content = msg["content"].strip()
+                # Tool calls and raw tool output add little to a summary
+                if is_observation(msg) or content.startswith(("{", "```")):
+                    continue
+                label = "User" if msg["role"] == "user" else "Assistant"
+                snippet = " ".join(content.split())[: self.summary_chars]
+                lines.append(f"- {label}: {snippet}")
+        if not lines:
+            return []
+        return [
+            {
+                "role": "system",
+                "content": "Summary of earlier conversation:\n" + "\n".join(lines),
+            }
+        ]
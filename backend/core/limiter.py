@@ -0,0 +1,115 @@
+import asyncio
+from collections import deque
+from typing import Any, Dict
+
+
+class OverloadedError(Exception):
+    """A limiter cannot take more work; callers should answer HTTP 503"""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit with a bounded wait queue
+
+    The limit grows by about one slot per round of successful requests
+    while its slots are actually in use (additive increase), and is cut by
+    `backoff` whenever the upstream signals overload, e.g. HTTP 429/503 or
+    a timeout (multiplicative decrease). Requests
+    beyond the limit wait in a FIFO queue; when the queue is full, or a
+    request has waited longer than `queue_timeout`, OverloadedError is
+    raised instead of piling up more work.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        max_queue: int = 32,
+        queue_timeout: float = 30.0,
+        backoff: float = 0.5,
+    ):
+        self.name = name
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.backoff = backoff
+        self.in_flight = 0
+        self.rejected = 0
+        self._waiters: "deque[asyncio.Future]" = deque()
+
+    @property
+    def saturated(self) -> bool:
+        """True when a new request would be rejected right away"""
+        return len(self._waiters) >= self.max_queue
+
+    async def acquire(self):
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return
+
+        if self.saturated:
+            self.rejected += 1
+            raise OverloadedError(
+                f"LLM endpoint {self.name} is overloaded "
+                f"({self.in_flight} running, {len(self._waiters)} queued)"
+            )
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # The releasing request hands its slot over by resolving the future
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+            self.rejected += 1
+            raise OverloadedError(
+                f"Timed out after {self.queue_timeout:.0f}s waiting for "
+                f"LLM endpoint {self.name}"
+            )
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+
+    def release(self, overloaded: bool = False, success: bool = True):
+        """Free a slot and adapt the limit to the request's outcome"""
+        # Successes only show the limit is safe, not that more would be:
+        # grow only if the request ran with the slots (nearly) all taken
+        busy = self.in_flight >= int(self.limit) - 1
+        self.in_flight -= 1
+        if overloaded:
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+        elif success and busy:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        self._wake()
+
+    def _abandon(self, waiter: asyncio.Future):
+        if waiter.done() and not waiter.cancelled():
+            # A slot was handed over just as we gave up; pass it on
+            self.in_flight -= 1
+            self._wake()
+        else:
+            waiter.cancel()
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def _wake(self):
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "rejected": self.rejected,
+        }
@@ -325,124 +325,444 @@
 
 # # Global LLM instance
 # llm = LLMProvider()
+import asyncio
 import json
+import random
 import httpx
-from typing import Dict, Any, List
-from openai import OpenAI
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Dict, Any, AsyncIterator, List, Optional
+from openai import APIStatusError, APITimeoutError, AsyncOpenAI
+from core.cache import LRUCache, SQLiteCache, canonical_hash
 from core.config import settings
+from core.limiter import AdaptiveLimiter
+from core.router import LLMRouter
+from core.singleflight import SingleFlight
 
+# Upstream statuses that mean "slow down", retried with backoff
+RETRYABLE_STATUS = (429, 503)
 
-class LLMProvider:
-    """Abstract LLM provider supporting OpenAI, Hugging Face, Ollama, and Groq"""
+# Action the model uses to answer when its output is restricted to JSON
+FINAL_ANSWER = "final_answer"
 
-    def __init__(self):
-        self.provider = settings.llm_provider.lower()
+# Tools offered for structured output: {"name", "description", "parameters"}
+ToolSpecs = Optional[List[Dict[str, Any]]]
+
+
+class LLMRateLimitError(Exception):
+    """Upstream asked us to slow down (HTTP 429/503); safe to retry"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class LLMTimeoutError(Exception):
+    """The request timed out; a busy endpoint (e.g. Ollama, which queues
+    internally) shows overload this way rather than with 429/503"""
+
+
+class LLMEndpoint:
+    """A single LLM backend: OpenAI, Hugging Face, Ollama, or Groq
+
+    Unset arguments fall back to the provider's settings.
+    """
+
+    def __init__(
+        self,
+        provider: str = None,
+        base_url: str = None,
+        model: str = None,
+        api_key: str = None,
+    ):
+        self.provider = (provider or settings.llm_provider).lower()
+
+        # Long-lived pooled HTTP client, created on first use
+        self._http: Optional[httpx.AsyncClient] = None
+        # AsyncOpenAI client (OpenAI/Groq), bound to the pooled HTTP client
+        self.client: Optional[AsyncOpenAI] = None
+        # Cleared when an older Ollama rejects a JSON schema `format`
+        self.schema_format = True
+        # Prompt token budget of the model's context window
+        self.context_tokens = {
+            "openai": settings.openai_context_tokens,
+            "hf": settings.hf_context_tokens,
+            "groq": settings.groq_context_tokens,
+        }.get(self.provider, settings.ollama_context_tokens)
 
         if self.provider == "openai":
-            if not settings.openai_api_key:
+            self.api_key = api_key or settings.openai_api_key
+            if not self.api_key:
                 raise ValueError("OPENAI_API_KEY is required for OpenAI provider")
-            self.client = OpenAI(api_key=settings.openai_api_key)
-            self.model = settings.openai_model
+            self.base_url = base_url or settings.openai_base_url
+            self.model = model or settings.openai_model
 
         elif self.provider == "hf":
-            if not settings.huggingface_api_key:
+            self.api_key = api_key or settings.huggingface_api_key
+            if not self.api_key:
                 raise ValueError("HUGGINGFACE_API_KEY is required for HF provider")
-            self.api_key = settings.huggingface_api_key
-            self.model = settings.huggingface_model
+            self.base_url = None
+            self.model = model or settings.huggingface_model
 
         elif self.provider == "groq":
-            if not settings.groq_api_key:
+            self.api_key = api_key or settings.groq_api_key
+            if not self.api_key:
                 raise ValueError("GROQ_API_KEY is required for Groq provider")
             # Groq uses OpenAI-compatible API
-            self.client = OpenAI(
-                api_key=settings.groq_api_key, base_url="https://api.groq.com/openai/v1"
-            )
-            self.model = settings.groq_model
+            self.base_url = base_url or settings.groq_base_url
+            self.model = model or settings.groq_model
             print(f"✓ Groq initialized successfully. Using model: {self.model}")
 
         elif self.provider == "ollama":
             # Validate Ollama configuration
-            if not settings.ollama_base_url:
+            base_url = base_url or settings.ollama_base_url
+            if not base_url:
                 raise ValueError("OLLAMA_BASE_URL is required for Ollama provider")
 
             # Clean up base URL
-            self.base_url = settings.ollama_base_url.rstrip("/")
-            self.model = settings.ollama_model or "llama3.2"
+            self.base_url = base_url.rstrip("/")
+            self.model = model or settings.ollama_model or "llama3.2"
+        else:
+            raise ValueError(f"Unknown LLM provider: {self.provider}")
 
-            # Synchronous validation on init
-            import requests
+        # Adaptive cap on concurrent requests to this endpoint
+        self.limiter = AdaptiveLimiter(
+            self.name,
+            initial=settings.llm_initial_concurrency,
+            max_limit=settings.llm_max_concurrency,
+            max_queue=settings.llm_max_queue,
+            queue_timeout=settings.llm_queue_timeout,
+        )
 
-            try:
-                response = requests.get(f"{self.base_url}/api/tags", timeout=10)
-                response.raise_for_status()
-                models_data = response.json()
-                available_models = [
-                    m.get("name", "") for m in models_data.get("models", [])
-                ]
-
-                if not available_models:
-                    print(
-                        f"⚠️  Warning: No models found in Ollama. Please run: ollama pull {self.model}"
-                    )
-                elif self.model not in available_models:
-                    print(
-                        f"⚠️  Warning: Model '{self.model}' not found. Available models: {', '.join(available_models[:5])}"
-                    )
-                    print(f"    To install: ollama pull {self.model}")
-                else:
-                    print(f"✓ Ollama connected successfully. Using model: {self.model}")
-
-            except requests.exceptions.RequestException as e:
-                raise ValueError(
-                    f"Cannot connect to Ollama at {self.base_url}. "
-                    f"Please ensure Ollama is running. Error: {str(e)}\n"
-                    f"Start Ollama with: ollama serve"
+    @property
+    def name(self) -> str:
+        return f"{self.provider}@{self.base_url}" if self.base_url else self.provider
+
+    async def check(self) -> Dict[str, Any]:
+        """Startup check: is the endpoint reachable and is the model there?
+
+        Only Ollama is probed; hosted APIs are assumed reachable. Never
+        raises, so an unavailable backend cannot crash the worker.
+        """
+        if self.provider != "ollama":
+            return {"endpoint": self.name, "ok": True}
+
+        try:
+            response = await self._get_http_client().get(
+                f"{self.base_url}/api/tags", timeout=settings.llm_connect_timeout
+            )
+            response.raise_for_status()
+            models_data = response.json()
+            available_models = [
+                m.get("name", "") for m in models_data.get("models", [])
+            ]
+
+            if not available_models:
+                print(
+                    f"⚠️  Warning: No models found in Ollama. Please run: ollama pull {self.model}"
                 )
-        else:
-            raise ValueError(f"Unknown LLM provider: {self.provider}")
+            elif self.model not in available_models:
+                print(
+                    f"⚠️  Warning: Model '{self.model}' not found. Available models: {', '.join(available_models[:5])}"
+                )
+                print(f"    To install: ollama pull {self.model}")
+            else:
+                print(f"✓ Ollama connected successfully. Using model: {self.model}")
+            return {"endpoint": self.name, "ok": True}
+
+        except Exception as e:
+            print(
+                f"⚠️  Cannot connect to Ollama at {self.base_url}: {str(e)}\n"
+                f"    Start Ollama with: ollama serve"
+            )
+            return {"endpoint": self.name, "ok": False, "error": str(e)}
+
+    def _get_http_client(self) -> httpx.AsyncClient:
+        """Return the shared HTTP client, creating it on first use"""
+        if self._http is None or self._http.is_closed:
+            timeout = {
+                "hf": settings.hf_timeout,
+                "openai": settings.openai_timeout,
+                "groq": settings.openai_timeout,
+            }.get(self.provider, settings.ollama_timeout)
+            # A new HTTP client invalidates any SDK client bound to the old one
+            self.client = None
+            self._http = httpx.AsyncClient(
+                timeout=httpx.Timeout(timeout, connect=settings.llm_connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=settings.llm_max_connections,
+                    max_keepalive_connections=settings.llm_max_keepalive_connections,
+                    keepalive_expiry=settings.llm_keepalive_expiry,
+                ),
+                http2=_http2_available(),
+            )
+        return self._http
+
+    def _get_openai_client(self) -> AsyncOpenAI:
+        """Return the AsyncOpenAI client sharing the pooled HTTP client"""
+        http_client = self._get_http_client()
+        if self.client is None:
+            self.client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                http_client=http_client,
+                max_retries=0,  # retries are handled by chat()/stream_chat()
+            )
+        return self.client
+
+    async def aclose(self):
+        """Close pooled connections (called on app shutdown)"""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+            self.client = None
 
     async def chat(
-        self, messages: List[Dict[str, str]], temperature: float = None
+        self, messages: List[Dict[str, str]], temp: float, tools: ToolSpecs = None
     ) -> str:
-        """Send messages to LLM and get response"""
-        temp = temperature if temperature is not None else settings.agent_temperature
+        """Send messages to this endpoint, within its concurrency limit
+
+        429/503 responses are retried with jittered exponential backoff,
+        honoring Retry-After. They and timeouts cut the concurrency limit.
+        """
+        attempt = 0
+        while True:
+            await self.limiter.acquire()
+            try:
+                response = await self._dispatch(messages, temp, tools)
+            except LLMRateLimitError as e:
+                self.limiter.release(overloaded=True)
+                await self._backoff(attempt, e)
+                attempt += 1
+                continue
+            except LLMTimeoutError:
+                self.limiter.release(overloaded=True)
+                raise
+            except BaseException:
+                self.limiter.release(success=False)
+                raise
+            self.limiter.release()
+            return response
+
+    async def stream_chat(
+        self, messages: List[Dict[str, str]], temp: float, tools: ToolSpecs = None
+    ) -> AsyncIterator[str]:
+        """Stream tokens from this endpoint, within its concurrency limit
+
+        Rate-limit responses are retried only before the first token.
+        """
+        attempt = 0
+        while True:
+            await self.limiter.acquire()
+            yielded = False
+            try:
+                async for token in self._dispatch_stream(messages, temp, tools):
+                    yielded = True
+                    yield token
+            except LLMRateLimitError as e:
+                self.limiter.release(overloaded=True)
+                if yielded:
+                    raise
+                await self._backoff(attempt, e)
+                attempt += 1
+                continue
+            except LLMTimeoutError:
+                self.limiter.release(overloaded=True)
+                raise
+            except BaseException:
+                self.limiter.release(success=False)
+                raise
+            self.limiter.release()
+            return
+
+    async def _backoff(self, attempt: int, error: LLMRateLimitError):
+        """Sleep before retry `attempt`, or re-raise once retries run out"""
+        if attempt >= settings.llm_max_retries:
+            raise error
+        if error.retry_after is not None:
+            if error.retry_after > settings.llm_retry_max_delay:
+                raise error
+            # Honor the server's hint, spreading clients out a little
+            delay = error.retry_after * random.uniform(1.0, 1.1)
+        else:
+            # Full jitter: uniform over an exponentially growing window
+            ceiling = settings.llm_retry_base_delay * (2**attempt)
+            delay = random.uniform(0, min(settings.llm_retry_max_delay, ceiling))
+        print(f"⚠️  {error} - retrying {self.name} in {delay:.1f}s")
+        await asyncio.sleep(delay)
+
+    async def _dispatch(
+        self, messages: List[Dict[str, str]], temp: float, tools: ToolSpecs = None
+    ) -> str:
+        """Call the provider-specific chat implementation
 
+        With `tools`, providers that support it return structured output
+        (a tool call as JSON text); Hugging Face ignores them.
+        """
         if self.provider == "openai":
-            return await self._openai_chat(messages, temp)
+            return await self._openai_chat(messages, temp, tools)
         elif self.provider == "hf":
             return await self._hf_chat(messages, temp)
         elif self.provider == "groq":
-            return await self._groq_chat(messages, temp)
+            return await self._groq_chat(messages, temp, tools)
         elif self.provider == "ollama":
-            return await self._ollama_chat(messages, temp)
+            return await self._ollama_chat(messages, temp, tools)
+
+    async def _dispatch_stream(
+        self, messages: List[Dict[str, str]], temp: float, tools: ToolSpecs = None
+    ) -> AsyncIterator[str]:
+        """Call the provider-specific streaming implementation
+
+        Ollama streams plain text: a JSON-constrained answer could not be
+        shown to the user token by token.
+        """
+        if self.provider in ("openai", "groq"):
+            stream = self._openai_stream(messages, temp, tools)
+        elif self.provider == "ollama":
+            stream = self._ollama_stream(messages, temp)
+        else:
+            # No streaming support: emit the full completion as one chunk
+            yield await self._dispatch(messages, temp, tools)
+            return
+
+        async for token in stream:
+            yield token
+
+    async def _openai_stream(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        tools: ToolSpecs = None,
+    ) -> AsyncIterator[str]:
+        """Streaming OpenAI/Groq Chat Completion
+
+        Text is streamed as it arrives; tool calls are assembled from their
+        deltas and yielded at the end as one line of JSON.
+        """
+        client = self._get_openai_client()
+        label = "Groq" if self.provider == "groq" else "OpenAI"
+        try:
+            stream = await client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=8000 if self.provider == "groq" else 2000,
+                stream=True,
+                **_openai_tool_args(tools),
+            )
+            # Parallel tool calls arrive interleaved, keyed by index
+            calls: Dict[int, List[str]] = {}
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                if delta.content:
+                    yield delta.content
+                for call in delta.tool_calls or []:
+                    if call.function is None:
+                        continue
+                    name, arguments = calls.setdefault(call.index, ["", ""])
+                    calls[call.index] = [
+                        name + (call.function.name or ""),
+                        arguments + (call.function.arguments or ""),
+                    ]
+            if calls:
+                yield "\n" + _tool_calls_text([calls[index] for index in sorted(calls)])
+        except (APITimeoutError, httpx.TimeoutException):
+            raise LLMTimeoutError(f"{label} request timed out")
+        except APIStatusError as e:
+            _raise_if_rate_limited(e.status_code, e.response.headers, label)
+            raise Exception(f"{label} API error: {str(e)}")
+        except Exception as e:
+            raise Exception(f"{label} API error: {str(e)}")
 
-    async def _openai_chat(
+    async def _ollama_stream(
         self, messages: List[Dict[str, str]], temperature: float
+    ) -> AsyncIterator[str]:
+        """Streaming Ollama Chat API (newline-delimited JSON chunks)"""
+        url = f"{self.base_url}/api/chat"
+
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "stream": True,
+            "options": {"temperature": temperature, "num_predict": 2000, "top_p": 0.9},
+        }
+
+        client = self._get_http_client()
+        try:
+            async with client.stream("POST", url, json=payload) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if "error" in chunk:
+                        raise Exception(f"Ollama error: {chunk['error']}")
+                    content = chunk.get("message", {}).get("content", "")
+                    if content:
+                        yield content
+                    if chunk.get("done"):
+                        break
+
+        except httpx.TimeoutException:
+            raise LLMTimeoutError(
+                "Ollama request timed out. The model may be too large or busy. "
+                "Try using a smaller model like 'llama3.2:1b' or increase timeout."
+            )
+        except httpx.HTTPStatusError as e:
+            _raise_if_rate_limited(e.response.status_code, e.response.headers, "Ollama")
+            raise Exception(f"Ollama HTTP error {e.response.status_code}")
+        except Exception as e:
+            raise Exception(f"Ollama API error: {str(e)}")
+
+    async def _openai_chat(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        tools: ToolSpecs = None,
     ) -> str:
         """OpenAI Chat Completion"""
+        client = self._get_openai_client()
         try:
-            response = self.client.chat.completions.create(
+            response = await client.chat.completions.create(
                 model=self.model,
                 messages=messages,
                 temperature=temperature,
                 max_tokens=2000,
+                **_openai_tool_args(tools),
             )
-            return response.choices[0].message.content
+            return _openai_message_text(response.choices[0].message)
+        except (APITimeoutError, httpx.TimeoutException):
+            raise LLMTimeoutError("OpenAI request timed out")
+        except APIStatusError as e:
+            _raise_if_rate_limited(e.status_code, e.response.headers, "OpenAI")
+            raise Exception(f"OpenAI API error: {str(e)}")
         except Exception as e:
             raise Exception(f"OpenAI API error: {str(e)}")
 
     async def _groq_chat(
-        self, messages: List[Dict[str, str]], temperature: float
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        tools: ToolSpecs = None,
     ) -> str:
         """Groq Chat Completion (OpenAI-compatible API)"""
+        client = self._get_openai_client()
         try:
-            response = self.client.chat.completions.create(
+            response = await client.chat.completions.create(
                 model=self.model,
                 messages=messages,
                 temperature=temperature,
                 max_tokens=8000,  # Groq supports higher token limits
+                **_openai_tool_args(tools),
             )
-            return response.choices[0].message.content
+            return _openai_message_text(response.choices[0].message)
+        except (APITimeoutError, httpx.TimeoutException):
+            raise LLMTimeoutError("Groq request timed out")
+        except APIStatusError as e:
+            _raise_if_rate_limited(e.status_code, e.response.headers, "Groq")
+            raise Exception(f"Groq API error: {str(e)}")
         except Exception as e:
             raise Exception(f"Groq API error: {str(e)}")
 
@@ -462,20 +782,30 @@ class LLMProvider:
             },
         }
 
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            try:
-                response = await client.post(url, headers=headers, json=payload)
-                response.raise_for_status()
-                result = response.json()
-
-                if isinstance(result, list) and len(result) > 0:
-                    return result[0].get("generated_text", "")
-                return str(result)
-            except Exception as e:
-                raise Exception(f"Hugging Face API error: {str(e)}")
+        client = self._get_http_client()
+        try:
+            response = await client.post(url, headers=headers, json=payload)
+            response.raise_for_status()
+            result = response.json()
+
+            if isinstance(result, list) and len(result) > 0:
+                return result[0].get("generated_text", "")
+            return str(result)
+        except httpx.TimeoutException:
+            raise LLMTimeoutError("Hugging Face request timed out")
+        except httpx.HTTPStatusError as e:
+            _raise_if_rate_limited(
+                e.response.status_code, e.response.headers, "Hugging Face"
+            )
+            raise Exception(f"Hugging Face API error: {str(e)}")
+        except Exception as e:
+            raise Exception(f"Hugging Face API error: {str(e)}")
 
     async def _ollama_chat(
-        self, messages: List[Dict[str, str]], temperature: float
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        tools: ToolSpecs = None,
     ) -> str:
         """Ollama Chat API with proper error handling"""
         url = f"{self.base_url}/api/chat"
@@ -486,41 +816,59 @@ class LLMProvider:
             "stream": False,
             "options": {"temperature": temperature, "num_predict": 2000, "top_p": 0.9},
         }
+        if tools and self.schema_format:
+            # Constrain decoding to an action object (Ollama >= 0.5)
+            payload["format"] = _ollama_format(tools)
 
-        async with httpx.AsyncClient(timeout=180.0) as client:
-            try:
+        client = self._get_http_client()
+        try:
+            response = await client.post(url, json=payload)
+            if (
+                "format" in payload
+                and response.status_code == 400
+                and "format" in response.text
+            ):
+                # Older servers reject a schema `format`; without it the
+                # reply is free text for the agent's text parser
+                print(
+                    f"⚠️  {self.name} rejected structured output "
+                    f"({response.text.strip()}); continuing without it"
+                )
+                self.schema_format = False
+                del payload["format"]
                 response = await client.post(url, json=payload)
-                response.raise_for_status()
-                result = response.json()
+            response.raise_for_status()
+            result = response.json()
 
-                # Check for errors in response
-                if "error" in result:
-                    raise Exception(f"Ollama error: {result['error']}")
+            # Check for errors in response
+            if "error" in result:
+                raise Exception(f"Ollama error: {result['error']}")
 
-                # Extract message content
-                message_content = result.get("message", {}).get("content", "")
+            # Extract message content
+            message_content = result.get("message", {}).get("content", "")
 
-                if not message_content:
-                    raise Exception("Ollama returned empty response")
+            if not message_content:
+                raise Exception("Ollama returned empty response")
 
-                return message_content
+            return message_content
 
-            except httpx.TimeoutException:
-                raise Exception(
-                    "Ollama request timed out. The model may be too large or busy. "
-                    "Try using a smaller model like 'llama3.2:1b' or increase timeout."
-                )
-            except httpx.HTTPStatusError as e:
-                if e.response.status_code == 404:
-                    raise Exception(
-                        f"Ollama API endpoint not found at {url}. "
-                        f"Please ensure Ollama is running with: ollama serve"
-                    )
+        except httpx.TimeoutException:
+            raise LLMTimeoutError(
+                "Ollama request timed out. The model may be too large or busy. "
+                "Try using a smaller model like 'llama3.2:1b' or increase timeout."
+            )
+        except httpx.HTTPStatusError as e:
+            _raise_if_rate_limited(e.response.status_code, e.response.headers, "Ollama")
+            if e.response.status_code == 404:
                 raise Exception(
-                    f"Ollama HTTP error {e.response.status_code}: {e.response.text}"
+                    f"Ollama API endpoint not found at {url}. "
+                    f"Please ensure Ollama is running with: ollama serve"
                 )
-            except Exception as e:
-                raise Exception(f"Ollama API error: {str(e)}")
+            raise Exception(
+                f"Ollama HTTP error {e.response.status_code}: {e.response.text}"
+            )
+        except Exception as e:
+            raise Exception(f"Ollama API error: {str(e)}")
 
     def _messages_to_prompt(self, messages: List[Dict[str, str]]) -> str:
         """Convert chat messages to a single prompt string for HF"""
@@ -539,5 +887,275 @@ class LLMProvider:
         return "\n\n".join(prompt_parts)
 
 
+class LLMProvider:
+    """LLM front end: response cache plus routing over one or more endpoints
+
+    Uses LLM_ENDPOINTS when set (a pool that may mix providers), otherwise a
+    single endpoint for LLM_PROVIDER.
+    """
+
+    def __init__(self):
+        if settings.llm_endpoints:
+            self.endpoints = [
+                LLMEndpoint(
+                    provider=spec.get("provider"),
+                    base_url=spec.get("base_url"),
+                    model=spec.get("model"),
+                    api_key=spec.get("api_key"),
+                )
+                for spec in settings.llm_endpoints
+            ]
+        else:
+            self.endpoints = [LLMEndpoint()]
+
+        self.router = LLMRouter(
+            self.endpoints,
+            hedge=settings.llm_hedge_requests,
+            hedge_min_samples=settings.llm_hedge_min_samples,
+            eject_after_failures=settings.llm_eject_after_failures,
+            eject_seconds=settings.llm_eject_seconds,
+        )
+        # Response cache (None when disabled)
+        self.cache = _build_cache()
+        # Identical concurrent requests share one upstream call
+        self.singleflight = SingleFlight()
+
+        # Identify the pool by every provider/model it may route to
+        self.provider = ",".join(sorted({e.provider for e in self.endpoints}))
+        self.model = ",".join(sorted({e.model for e in self.endpoints}))
+        # Any endpoint may serve a request, so budget for the smallest window
+        self.context_tokens = min(e.context_tokens for e in self.endpoints)
+
+    async def startup(self) -> List[Dict[str, Any]]:
+        """Check every endpoint concurrently"""
+        return list(
+            await asyncio.gather(*(endpoint.check() for endpoint in self.endpoints))
+        )
+
+    @property
+    def saturated(self) -> bool:
+        """True when every endpoint would reject a new request"""
+        return all(endpoint.limiter.saturated for endpoint in self.endpoints)
+
+    async def aclose(self):
+        """Close pooled connections of every endpoint (called on app shutdown)"""
+        for endpoint in self.endpoints:
+            await endpoint.aclose()
+
+    async def chat(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = None,
+        tools: ToolSpecs = None,
+    ) -> str:
+        """Send messages to LLM and get response
+
+        `tools` ({"name", "description", "parameters"} dicts) enable
+        structured output where the provider supports it: a tool call comes
+        back as JSON text {"thought", "action", "input"}.
+        """
+        temp = temperature if temperature is not None else settings.agent_temperature
+
+        key = self._request_key(messages, temp, tools)
+        use_cache = self._cacheable(temp)
+        if use_cache:
+            cached = await self.cache.aget(key)
+            if cached is not None:
+                return cached
+
+        response = await self.singleflight.do(
+            key,
+            lambda: self.router.call(
+                lambda endpoint: endpoint.chat(messages, temp, tools)
+            ),
+        )
+
+        if use_cache and response:
+            await self.cache.aset(key, response)
+        return response
+
+    async def stream_chat(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = None,
+        tools: ToolSpecs = None,
+    ) -> AsyncIterator[str]:
+        """Send messages to LLM and yield response tokens as they arrive"""
+        temp = temperature if temperature is not None else settings.agent_temperature
+
+        # Streams are per-consumer, so they use the cache but not single-flight
+        key = self._request_key(messages, temp, tools)
+        use_cache = self._cacheable(temp)
+        if use_cache:
+            cached = await self.cache.aget(key)
+            if cached is not None:
+                yield cached
+                return
+
+        chunks = []
+        async for token in self.router.stream(
+            lambda endpoint: endpoint.stream_chat(messages, temp, tools)
+        ):
+            chunks.append(token)
+            yield token
+
+        if use_cache and chunks:
+            await self.cache.aset(key, "".join(chunks))
+
+    def _request_key(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        tools: ToolSpecs = None,
+    ) -> str:
+        """Canonical key of a request, shared by the cache and single-flight"""
+        return canonical_hash(self.provider, self.model, temperature, messages, tools)
+
+    def _cacheable(self, temperature: float) -> bool:
+        if self.cache is None:
+            return False
+        # Sampling makes responses non-deterministic; only cache if opted in
+        return temperature == 0 or settings.llm_cache_nonzero_temperature
+
+
+def _openai_tool_args(tools: ToolSpecs) -> Dict[str, Any]:
+    """Function-calling arguments for the OpenAI/Groq chat API"""
+    if not tools:
+        return {}
+    return {
+        "tools": [{"type": "function", "function": tool} for tool in tools],
+        "tool_choice": "auto",
+    }
+
+
+def _openai_message_text(message) -> str:
+    """Assistant text, or its tool calls as JSON"""
+    if message.tool_calls:
+        return _tool_calls_text(
+            [
+                (call.function.name, call.function.arguments)
+                for call in message.tool_calls
+            ],
+            message.content,
+        )
+    return message.content
+
+
+def _ollama_format(tools: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """JSON schema of one agent step, for Ollama's `format` option
+
+    Tool inputs are validated by each tool; the schema only pins the
+    envelope, which is what free-text parsing used to get wrong, and the
+    final answer's input, which the agent reads as {"answer": "..."}.
+    """
+    tool_action = {
+        "type": "object",
+        "properties": {
+            "action": {"type": "string", "enum": [tool["name"] for tool in tools]},
+            "input": {"type": "object"},
+        },
+        "required": ["action", "input"],
+    }
+    final_action = {
+        "type": "object",
+        "properties": {
+            "action": {"type": "string", "enum": [FINAL_ANSWER]},
+            "input": {
+                "type": "object",
+                "properties": {"answer": {"type": "string"}},
+                "required": ["answer"],
+            },
+        },
+        "required": ["action", "input"],
+    }
+    return {
+        "type": "object",
+        "properties": {
+            "thought": {"type": "string"},
+            "actions": {
+                "type": "array",
+                "minItems": 1,
+                "items": {"anyOf": [tool_action, final_action]},
+            },
+        },
+        "required": ["actions"],
+    }
+
+
+def _tool_calls_text(calls, thought: Optional[str] = None) -> str:
+    """Compact JSON of (name, arguments) tool calls, in the agent's protocol
+
+    One call becomes {"thought", "action", "input"}, several become
+    {"thought", "actions": [{"action", "input"}, ...]}.
+    """
+    actions = []
+    for name, arguments in calls:
+        try:
+            tool_input = json.loads(arguments) if arguments else {}
+        except json.JSONDecodeError:
+            tool_input = {}
+        actions.append({"action": name, "input": tool_input})
+
+    step = {"thought": thought or ""}
+    if len(actions) == 1:
+        step.update(actions[0])
+    else:
+        step["actions"] = actions
+    return json.dumps(step, separators=(",", ":"), ensure_ascii=False)
+
+
+def _raise_if_rate_limited(status_code: int, headers, label: str):
+    """Raise LLMRateLimitError for 429/503 responses"""
+    if status_code in RETRYABLE_STATUS:
+        raise LLMRateLimitError(
+            f"{label} HTTP error {status_code}", _parse_retry_after(headers)
+        )
+
+
+def _parse_retry_after(headers) -> Optional[float]:
+    """Retry-After header as seconds (delta-seconds or HTTP-date form)"""
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+        return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def _build_cache():
+    """Create the configured LLM response cache"""
+    if not settings.llm_cache_enabled:
+        return None
+    if settings.llm_cache_backend == "sqlite":
+        return SQLiteCache(
+            settings.llm_cache_path,
+            max_entries=settings.llm_cache_max_entries,
+            ttl=settings.llm_cache_ttl,
+        )
+    return LRUCache(
+        max_entries=settings.llm_cache_max_entries, ttl=settings.llm_cache_ttl
+    )
+
+
+def _http2_available() -> bool:
+    """HTTP/2 is opt-in and needs the optional h2 package"""
+    if not settings.llm_http2:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        print(
+            "⚠️  Warning: LLM_HTTP2 is enabled but 'h2' is not installed; using HTTP/1.1"
+        )
+        return False
+    return True
+
+
 # Global LLM instance
 llm = LLMProvider()
@@ -0,0 +1,199 @@
+import asyncio
+import json
+import re
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List
+
+# {{step_id}} or {{step_id.path.to.value}}; list items by index, e.g. {{s1.results.0}}
+REFERENCE = re.compile(r"\{\{\s*([A-Za-z_][\w-]*)((?:\.[\w-]+)*)\s*\}\}")
+
+
+class PlanError(ValueError):
+    """The planner's output is not a usable plan"""
+
+
+def parse_plan(text: str, tool_names: Iterable[str]) -> List[Dict[str, Any]]:
+    """Parse and validate a plan, returning its steps in dependency order
+
+    A plan is {"steps": [{"id", "action", "input", "depends_on"}, ...]}.
+    Steps referenced in an input depend on the referenced step even if
+    depends_on does not say so.
+    """
+    stripped = text.strip()
+    start, end = stripped.find("{"), stripped.rfind("}")
+    if start == -1 or end < start:
+        raise PlanError("No JSON plan found")
+    try:
+        data = json.loads(stripped[start : end + 1])
+    except json.JSONDecodeError as e:
+        raise PlanError(f"Invalid plan JSON: {e}")
+
+    raw_steps = data.get("steps") if isinstance(data, dict) else None
+    if not isinstance(raw_steps, list):
+        raise PlanError('Plan has no "steps" list')
+
+    tool_names = set(tool_names)
+    steps: Dict[str, Dict[str, Any]] = {}
+    for index, raw in enumerate(raw_steps):
+        if not isinstance(raw, dict):
+            raise PlanError(f"Step {index} is not an object")
+        step_id = raw.get("id") or f"s{index + 1}"
+        if not isinstance(step_id, str):
+            raise PlanError(f"Step {index} has a non-string id: {step_id!r}")
+        if step_id in steps:
+            raise PlanError(f"Duplicate step id: {step_id}")
+        action = raw.get("action")
+        if not isinstance(action, str) or action not in tool_names:
+            raise PlanError(f"Step {step_id} uses unknown tool: {action!r}")
+        tool_input = raw.get("input", {})
+        depends_on = set(_dependencies(step_id, raw.get("depends_on")))
+        depends_on.update(_references(tool_input))
+        steps[step_id] = {
+            "id": step_id,
+            "action": raw["action"],
+            "input": tool_input,
+            "depends_on": sorted(depends_on),
+        }
+
+    for step in steps.values():
+        for dependency in step["depends_on"]:
+            if dependency not in steps:
+                raise PlanError(
+                    f"Step {step['id']} depends on unknown step {dependency}"
+                )
+    return _topological_order(steps)
+
+
+def _dependencies(step_id: str, value: Any) -> List[str]:
+    """depends_on as a list of step ids; a single id may be a bare string"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [value]
+    if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+        raise PlanError(f"Step {step_id} has invalid depends_on: {value!r}")
+    return value
+
+
+def resolve_references(
+    value: Any, outputs: Dict[str, Any], python: bool = False
+) -> Any:
+    """Replace {{step.path}} references with earlier steps' outputs
+
+    A string that is exactly one reference becomes the referenced value
+    itself; references inside longer strings are replaced by the value as
+    a Python literal (python=True, for code) or as JSON.
+    """
+    if isinstance(value, dict):
+        return {k: resolve_references(v, outputs, python) for k, v in value.items()}
+    if isinstance(value, list):
+        return [resolve_references(v, outputs, python) for v in value]
+    if not isinstance(value, str):
+        return value
+
+    whole = REFERENCE.fullmatch(value.strip())
+    if whole and not python:
+        return _lookup(outputs, whole.group(1), whole.group(2))
+
+    def literal(match: re.Match) -> str:
+        found = _lookup(outputs, match.group(1), match.group(2))
+        return repr(found) if python else json.dumps(found, default=str)
+
+    return REFERENCE.sub(literal, value)
+
+
+async def execute_plan(
+    steps: List[Dict[str, Any]],
+    run_step: Callable[[Dict[str, Any], Dict[str, Any]], Awaitable[Dict[str, Any]]],
+) -> AsyncIterator[Dict[str, Any]]:
+    """Run plan steps with maximum parallelism
+
+    A step starts as soon as all of its dependencies have finished, via
+    run_step(step, resolved_input), which returns the step's observation.
+    Steps whose dependencies failed are skipped with an error. Yields
+    {"type": "start", "step", "input"} and {"type": "end", "step",
+    "observation"} events as they happen.
+    """
+    outputs: Dict[str, Dict[str, Any]] = {}
+    failed = set()
+    pending = list(steps)
+    running: Dict[asyncio.Task, Dict[str, Any]] = {}
+    try:
+        while pending or running:
+            # Steps are in dependency order, so failures propagate in one pass
+            for step in list(pending):
+                failed_dependency = next(
+                    (dep for dep in step["depends_on"] if dep in failed), None
+                )
+                if failed_dependency is not None:
+                    pending.remove(step)
+                    failed.add(step["id"])
+                    outputs[step["id"]] = {
+                        "error": f"Skipped: step {failed_dependency} failed"
+                    }
+                    yield {
+                        "type": "end",
+                        "step": step,
+                        "observation": outputs[step["id"]],
+                    }
+                elif all(dep in outputs for dep in step["depends_on"]):
+                    pending.remove(step)
+                    tool_input = resolve_references(
+                        step["input"], outputs, python=step["action"] == "python"
+                    )
+                    yield {"type": "start", "step": step, "input": tool_input}
+                    running[asyncio.ensure_future(run_step(step, tool_input))] = step
+
+            if not running:
+                break
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                step = running.pop(task)
+                observation = task.result()
+                outputs[step["id"]] = observation
+                if "error" in observation:
+                    failed.add(step["id"])
+                yield {"type": "end", "step": step, "observation": observation}
+    finally:
+        for task in running:
+            task.cancel()
+
+
+def _references(value: Any) -> List[str]:
+    """Step ids referenced anywhere in a step input"""
+    if isinstance(value, dict):
+        return [ref for v in value.values() for ref in _references(v)]
+    if isinstance(value, list):
+        return [ref for v in value for ref in _references(v)]
+    if isinstance(value, str):
+        return [match.group(1) for match in REFERENCE.finditer(value)]
+    return []
+
+
+def _lookup(outputs: Dict[str, Any], step_id: str, path: str) -> Any:
+    value = outputs.get(step_id)
+    for key in filter(None, path.split(".")):
+        if isinstance(value, list) and key.isdigit() and int(key) < len(value):
+            value = value[int(key)]
+        elif isinstance(value, dict):
+            value = value.get(key)
+        else:
+            return None
+    return value
+
+
+def _topological_order(steps: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Kahn's algorithm; raises PlanError on cycles"""
+    remaining = {step_id: set(step["depends_on"]) for step_id, step in steps.items()}
+    ordered = []
+    while remaining:
+        ready = [step_id for step_id, deps in remaining.items() if not deps]
+        if not ready:
+            raise PlanError(
+                f"Plan has a dependency cycle among: {', '.join(remaining)}"
+            )
+        for step_id in ready:
+            ordered.append(steps[step_id])
+            del remaining[step_id]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+    return ordered
@@ -0,0 +1,215 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from core.limiter import OverloadedError
+
+
+class EndpointState:
+    """Latency and health bookkeeping for one LLM endpoint"""
+
+    def __init__(self, endpoint, alpha: float):
+        self.endpoint = endpoint
+        self.alpha = alpha
+        self.ewma_latency: Optional[float] = None
+        self.latencies = deque(maxlen=200)
+        self.in_flight = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.hedges = 0
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+    def score(self) -> float:
+        """Expected wait: moving-average latency times queued work
+
+        Endpoints without latency samples score 0 so they get probed.
+        """
+        return (self.ewma_latency or 0.0) * (self.in_flight + 1)
+
+    def p95(self, min_samples: int) -> Optional[float]:
+        if len(self.latencies) < min_samples:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+    def record_success(self, latency: float):
+        self.consecutive_failures = 0
+        self.latencies.append(latency)
+        if self.ewma_latency is None:
+            self.ewma_latency = latency
+        else:
+            self.ewma_latency = (
+                self.alpha * latency + (1 - self.alpha) * self.ewma_latency
+            )
+
+    def record_failure(self, eject_after: int, eject_seconds: float):
+        self.errors += 1
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= eject_after:
+            now = time.monotonic()
+            was_healthy = self.healthy(now)
+            self.ejected_until = now + eject_seconds
+            if was_healthy:
+                print(
+                    f"⚠️  LLM endpoint {self.endpoint.name} ejected for {eject_seconds:.0f}s "
+                    f"after {self.consecutive_failures} consecutive failures"
+                )
+
+
+class LLMRouter:
+    """Latency-aware load balancing over a pool of LLM endpoints
+
+    Each request goes to the healthy endpoint with the lowest expected wait
+    (moving-average latency x in-flight requests). Endpoints that fail
+    repeatedly are ejected for a cool-down period, and a failed request is
+    retried once on the next best endpoint. With hedging enabled, a second
+    copy of a request is sent to another endpoint once the first has been
+    outstanding longer than its endpoint's p95 latency; the first answer
+    wins and the other is cancelled.
+    """
+
+    def __init__(
+        self,
+        endpoints: List[Any],
+        hedge: bool = False,
+        hedge_min_samples: int = 20,
+        eject_after_failures: int = 3,
+        eject_seconds: float = 30.0,
+        ewma_alpha: float = 0.2,
+    ):
+        self.states = [EndpointState(endpoint, ewma_alpha) for endpoint in endpoints]
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self.eject_after_failures = eject_after_failures
+        self.eject_seconds = eject_seconds
+
+    def pick(self, exclude=()) -> Optional[EndpointState]:
+        """Best endpoint not in `exclude`, or None if there is none"""
+        candidates = [state for state in self.states if state not in exclude]
+        if not candidates:
+            return None
+
+        now = time.monotonic()
+        healthy = [state for state in candidates if state.healthy(now)]
+        if not healthy:
+            # Everything is ejected: probe the one that recovers first
+            return min(candidates, key=lambda state: state.ejected_until)
+        return min(healthy, key=lambda state: (state.score(), state.in_flight))
+
+    async def call(self, fn: Callable[[Any], Awaitable[Any]]) -> Any:
+        """Run fn(endpoint) on the best endpoint, with failover and hedging"""
+        state = self.pick()
+        try:
+            if self.hedge and len(self.states) > 1:
+                return await self._hedged(fn, state)
+            return await self._attempt(fn, state)
+        except Exception:
+            fallback = self.pick(exclude={state})
+            if fallback is None:
+                raise
+            return await self._attempt(fn, fallback)
+
+    async def stream(
+        self, fn: Callable[[Any], AsyncIterator[str]]
+    ) -> AsyncIterator[str]:
+        """Stream fn(endpoint) from the best endpoint
+
+        Fails over to the next endpoint only if nothing was yielded yet.
+        """
+        tried = set()
+        while True:
+            state = self.pick(exclude=tried)
+            tried.add(state)
+            yielded = False
+            state.in_flight += 1
+            state.requests += 1
+            start = time.monotonic()
+            try:
+                async for token in fn(state.endpoint):
+                    yielded = True
+                    yield token
+            except OverloadedError:
+                # Busy, not broken: try elsewhere without counting a failure
+                if self.pick(exclude=tried) is None:
+                    raise
+                continue
+            except Exception:
+                state.record_failure(self.eject_after_failures, self.eject_seconds)
+                if yielded or self.pick(exclude=tried) is None:
+                    raise
+                continue
+            finally:
+                state.in_flight -= 1
+            state.record_success(time.monotonic() - start)
+            return
+
+    async def _attempt(self, fn, state: EndpointState) -> Any:
+        state.in_flight += 1
+        state.requests += 1
+        start = time.monotonic()
+        try:
+            result = await fn(state.endpoint)
+        except (asyncio.CancelledError, OverloadedError):
+            # Lost a hedge race or endpoint busy; not a health problem
+            raise
+        except Exception:
+            state.record_failure(self.eject_after_failures, self.eject_seconds)
+            raise
+        finally:
+            state.in_flight -= 1
+        state.record_success(time.monotonic() - start)
+        return result
+
+    async def _hedged(self, fn, primary: EndpointState) -> Any:
+        delay = primary.p95(self.hedge_min_samples)
+        first = asyncio.create_task(self._attempt(fn, primary))
+        pending = {first}
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(pending, timeout=delay)
+                backup = None if done else self.pick(exclude={primary})
+                if backup is not None:
+                    backup.hedges += 1
+                    pending.add(asyncio.create_task(self._attempt(fn, backup)))
+
+            # First successful answer wins
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        return [
+            {
+                "endpoint": state.endpoint.name,
+                "healthy": state.healthy(now),
+                "in_flight": state.in_flight,
+                "requests": state.requests,
+                "errors": state.errors,
+                "hedges": state.hedges,
+                "ewma_latency_ms": (
+                    round(state.ewma_latency * 1000, 1)
+                    if state.ewma_latency is not None
+                    else None
+                ),
+                "p95_latency_ms": (
+                    round(state.p95(1) * 1000, 1) if state.latencies else None
+                ),
+            }
+            for state in self.states
+        ]
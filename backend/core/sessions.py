@@ -0,0 +1,161 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from core.cache import LRUCache
+from core.config import settings
+
+
+class MemorySessionStore:
+    """Conversation histories kept in process memory
+
+    Least recently used sessions are evicted beyond `max_sessions`, and a
+    session expires `ttl` seconds after its last turn.
+    """
+
+    backend = "memory"
+
+    def __init__(self, max_sessions: int = 1000, ttl: float = 86400.0):
+        self._cache = LRUCache(max_entries=max_sessions, ttl=ttl)
+
+    async def load(self, session_id: str) -> Optional[List[Dict[str, str]]]:
+        """History of a session (oldest first), or None if unknown/expired"""
+        history = self._cache.get(session_id)
+        return list(history) if history is not None else None
+
+    async def append(self, session_id: str, messages: List[Dict[str, str]]):
+        history = self._cache.get(session_id) or []
+        history.extend(messages)
+        # Re-setting refreshes both recency and expiry
+        self._cache.set(session_id, history)
+
+    async def delete(self, session_id: str):
+        self._cache.delete(session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.backend, "sessions": len(self._cache)}
+
+
+class SQLiteSessionStore:
+    """Conversation histories in a SQLite file (survives restarts)
+
+    Messages are appended as rows, so a turn costs the same however long
+    the session is. Eviction matches MemorySessionStore.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, path: str, max_sessions: int = 1000, ttl: float = 86400.0):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                last_access REAL NOT NULL
+            )""")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS messages (
+                session_id TEXT NOT NULL
+                    REFERENCES sessions (session_id) ON DELETE CASCADE,
+                seq INTEGER NOT NULL,
+                message TEXT NOT NULL,
+                PRIMARY KEY (session_id, seq)
+            )""")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access)"
+        )
+        self._conn.commit()
+
+    def _load(self, session_id: str) -> Optional[List[Dict[str, str]]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_access FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is None or (self.ttl > 0 and row[0] + self.ttl < time.time()):
+                return None
+            rows = self._conn.execute(
+                "SELECT message FROM messages WHERE session_id = ? ORDER BY seq",
+                (session_id,),
+            ).fetchall()
+        return [json.loads(message) for (message,) in rows]
+
+    def _append(self, session_id: str, messages: List[Dict[str, str]]):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO sessions (session_id, last_access) VALUES (?, ?) "
+                "ON CONFLICT (session_id) DO UPDATE SET last_access = excluded.last_access",
+                (session_id, now),
+            )
+            (next_seq,) = self._conn.execute(
+                "SELECT COALESCE(MAX(seq) + 1, 0) FROM messages WHERE session_id = ?",
+                (session_id,),
+            ).fetchone()
+            self._conn.executemany(
+                "INSERT INTO messages (session_id, seq, message) VALUES (?, ?, ?)",
+                [
+                    (session_id, next_seq + i, json.dumps(message))
+                    for i, message in enumerate(messages)
+                ],
+            )
+            # Evict expired sessions and the least recently used beyond the bound
+            if self.ttl > 0:
+                self._conn.execute(
+                    "DELETE FROM sessions WHERE last_access < ?", (now - self.ttl,)
+                )
+            self._conn.execute(
+                "DELETE FROM sessions WHERE session_id IN ("
+                "SELECT session_id FROM sessions ORDER BY last_access DESC "
+                "LIMIT -1 OFFSET ?)",
+                (self.max_sessions,),
+            )
+            self._conn.commit()
+
+    def _delete(self, session_id: str):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM sessions WHERE session_id = ?", (session_id,)
+            )
+            self._conn.commit()
+
+    async def load(self, session_id: str) -> Optional[List[Dict[str, str]]]:
+        """History of a session (oldest first), or None if unknown/expired"""
+        return await asyncio.to_thread(self._load, session_id)
+
+    async def append(self, session_id: str, messages: List[Dict[str, str]]):
+        await asyncio.to_thread(self._append, session_id, messages)
+
+    async def delete(self, session_id: str):
+        await asyncio.to_thread(self._delete, session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()
+        return {"backend": self.backend, "sessions": count}
+
+
+def new_session_id() -> str:
+    return uuid.uuid4().hex
+
+
+def _build_store():
+    """Create the configured session store"""
+    if settings.session_backend == "sqlite":
+        return SQLiteSessionStore(
+            settings.session_path,
+            max_sessions=settings.session_max_sessions,
+            ttl=settings.session_ttl,
+        )
+    return MemorySessionStore(
+        max_sessions=settings.session_max_sessions, ttl=settings.session_ttl
+    )
+
+
+# Global session store
+session_store = _build_store()
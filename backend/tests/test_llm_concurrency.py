@@ -0,0 +1,55 @@
+"""
+Parallel OpenAI-compatible chats must overlap instead of serializing on
+the event loop (timings: python -m benchmarks.bench_llm_concurrency)
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from benchmarks.stub_server import StubLLMServer
+from core.config import settings
+from core.llm import LLMProvider
+
+DELAY = 0.5
+PARALLEL = 8
+
+
+@pytest.fixture
+def stub_server():
+    server = StubLLMServer(delay=DELAY).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def provider(stub_server, monkeypatch):
+    monkeypatch.setattr(settings, "llm_endpoints", [])
+    monkeypatch.setattr(settings, "llm_provider", "groq")
+    monkeypatch.setattr(settings, "groq_api_key", "stub")
+    monkeypatch.setattr(settings, "groq_base_url", f"{stub_server.url}/v1")
+    monkeypatch.setattr(settings, "llm_cache_enabled", False)
+    # Room for every chat at once, so only the event loop could serialize
+    monkeypatch.setattr(settings, "llm_initial_concurrency", PARALLEL)
+    return LLMProvider()
+
+
+async def _parallel_chats(provider: LLMProvider, n: int):
+    # Distinct messages, so identical-call coalescing cannot help
+    messages = [[{"role": "user", "content": f"question {i}"}] for i in range(n)]
+    start = time.perf_counter()
+    try:
+        replies = await asyncio.gather(*(provider.chat(m) for m in messages))
+    finally:
+        await provider.aclose()
+    return time.perf_counter() - start, replies
+
+
+def test_parallel_chats_overlap(provider, stub_server):
+    elapsed, replies = asyncio.run(_parallel_chats(provider, PARALLEL))
+
+    assert replies == ["ok"] * PARALLEL
+    assert stub_server.request_count == PARALLEL
+    # Serialized calls would take PARALLEL * DELAY
+    assert elapsed < DELAY * 2, f"chats did not overlap ({elapsed:.2f}s)"
@@ -0,0 +1,59 @@
+"""
+Charts rendered concurrently, in threads or processes, must be exactly the
+charts rendered one at a time: no shared pyplot state (timings:
+python -m benchmarks.bench_render)
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+
+from benchmarks.bench_render import make_specs
+from tools.visualize import render_chart
+
+CHARTS = 16
+WORKERS = 4
+
+
+@pytest.fixture(scope="module")
+def figures(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("charts")
+    return {"directory": str(directory), "format": "png", "dpi": 60}
+
+
+@pytest.fixture(scope="module")
+def expected(figures):
+    """Serial renders; charts are content-addressed, so URLs identify bytes"""
+    results = [render_chart(spec, figures) for spec in make_specs(CHARTS)]
+    assert all(result.get("success") for result in results), results
+    return [result["image"]["url"] for result in results]
+
+
+def _render_concurrently(executor, figures):
+    futures = [
+        executor.submit(render_chart, spec, figures) for spec in make_specs(CHARTS)
+    ]
+    return [future.result() for future in futures]
+
+
+def _urls(results):
+    return [result.get("image", {}).get("url") for result in results]
+
+
+def test_charts_differ(expected):
+    # Otherwise matching URLs would prove nothing
+    assert len(set(expected)) == CHARTS
+
+
+def test_thread_renders_match_serial(figures, expected):
+    with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+        results = _render_concurrently(executor, figures)
+    assert _urls(results) == expected
+
+
+def test_process_renders_match_serial(figures, expected):
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=2, mp_context=context) as executor:
+        results = _render_concurrently(executor, figures)
+    assert _urls(results) == expected
@@ -0,0 +1,67 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+def numeric_axis(values) -> Tuple[Optional[np.ndarray], bool]:
+    """Axis values as float64, and whether they were dates
+
+    Numbers are used as-is and ISO date strings become datetime64. Returns
+    (None, False) for anything else (e.g. category labels).
+    """
+    array = np.asarray(values)
+    if array.dtype.kind in "iuf":
+        return array.astype(np.float64), False
+    if array.dtype.kind in "UO":
+        try:
+            return array.astype("datetime64[ns]"), True
+        except (ValueError, TypeError, OverflowError):
+            return None, False
+    return None, False
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: indices of n_out points that keep
+    the visual shape of the series (x must be sorted)
+
+    The first and last points are kept; the points in between are split
+    into n_out - 2 buckets and from each the point forming the largest
+    triangle with the previously kept point and the next bucket's average
+    is kept. Bucket averages and triangle areas are vectorized, leaving
+    one cheap iteration per output point.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # n_out - 2 buckets over the interior points; edges are strictly
+    # increasing because there are more interior points than buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    counts = np.diff(edges)
+    avg_x = np.add.reduceat(x[: n - 1], edges[:-1]) / counts
+    avg_y = np.add.reduceat(y[: n - 1], edges[:-1]) / counts
+    # The last bucket looks ahead to the last point
+    avg_x = np.append(avg_x[1:], x[-1])
+    avg_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for bucket in range(n_out - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        # Twice the triangle area; the constant factor doesn't change argmax
+        area = np.abs(
+            (x[a] - avg_x[bucket]) * (y[start:stop] - y[a])
+            - (x[a] - x[start:stop]) * (avg_y[bucket] - y[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[bucket + 1] = a
+    return selected
+
+
+def density_grid(
+    x: np.ndarray, y: np.ndarray, bins: Tuple[int, int] = (200, 120)
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Point counts on a regular grid: (counts[x_bin, y_bin], x_edges, y_edges)"""
+    finite = np.isfinite(x) & np.isfinite(y)
+    return np.histogram2d(x[finite], y[finite], bins=bins)
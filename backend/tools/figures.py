@@ -0,0 +1,114 @@
+import hashlib
+import io
+import json
+import os
+from typing import Any, Dict
+
+import matplotlib
+
+from core.config import settings
+
+# SVG element ids are random unless salted, which would defeat content
+# addressing
+matplotlib.rcParams['svg.hashsalt'] = 'datapilot'
+
+FORMATS = {
+    'png': 'image/png',
+    'webp': 'image/webp',
+    'svg': 'image/svg+xml',
+}
+
+# Charts the browser renders from a declarative spec
+VEGA_LITE = 'application/vnd.vegalite.v5+json'
+
+
+def figure_options() -> Dict[str, Any]:
+    """save_figure() arguments from the app settings"""
+    return {
+        "directory": os.path.abspath(os.path.join(settings.static_dir, "charts")),
+        "url_prefix": "/static/charts",
+        "format": settings.figure_format,
+        "dpi": settings.figure_dpi,
+        "webp_quality": settings.figure_webp_quality
+    }
+
+
+def save_figure(
+    fig,
+    directory: str,
+    url_prefix: str = '/static/charts',
+    format: str = 'png',
+    dpi: int = 100,
+    webp_quality: int = 80
+) -> Dict[str, Any]:
+    """Render a matplotlib figure to a file named after its content
+
+    The file is written to `directory` as <sha256>.<format>, so identical
+    charts share one file and a URL always means the same image. Returns the
+    image descriptor tools put in their results: url, media_type, bytes,
+    and width/height in pixels (None for SVG).
+    """
+    if format not in FORMATS:
+        raise ValueError(f"Unsupported figure format: {format}. Use one of: {', '.join(FORMATS)}")
+
+    options = {}
+    if format == 'webp':
+        options['pil_kwargs'] = {'quality': webp_quality}
+    elif format == 'svg':
+        # No creation date, so the same chart renders to the same bytes
+        options['metadata'] = {'Date': None}
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format=format, dpi=dpi, bbox_inches='tight', **options)
+    data = buf.getvalue()
+
+    name = _write_content(directory, data, format)
+
+    width = height = None
+    if format != 'svg':
+        from PIL import Image
+        with Image.open(io.BytesIO(data)) as image:
+            width, height = image.size
+
+    return {
+        "url": f"{url_prefix}/{name}",
+        "media_type": FORMATS[format],
+        "bytes": len(data),
+        "width": width,
+        "height": height
+    }
+
+
+def save_spec(spec: Dict[str, Any], directory: str, url_prefix: str = '/static/charts') -> Dict[str, Any]:
+    """Save a Vega-Lite spec like save_figure() saves an image
+
+    The file is <sha256>.vl.json; the browser renders it, so the descriptor
+    has no pixel size.
+    """
+    data = json.dumps(spec, separators=(',', ':'), allow_nan=False).encode('utf-8')
+    name = _write_content(directory, data, 'vl.json')
+    return {
+        "url": f"{url_prefix}/{name}",
+        "media_type": VEGA_LITE,
+        "bytes": len(data),
+        "width": None,
+        "height": None
+    }
+
+
+def _write_content(directory: str, data: bytes, extension: str) -> str:
+    """Write `data` to `directory` named after its hash; returns the name"""
+    name = f"{hashlib.sha256(data).hexdigest()[:32]}.{extension}"
+    path = os.path.join(directory, name)
+    try:
+        # Already there: mark it as fresh, so garbage collection of
+        # unreferenced files (by age) doesn't delete it under the new URL
+        os.utime(path)
+    except FileNotFoundError:
+        os.makedirs(directory, exist_ok=True)
+        # Write-then-rename so a reader never sees a partial file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return name
@@ -1,6 +1,7 @@
 from pymongo import MongoClient
 from typing import Dict, Any, List
 from core.config import settings
+import asyncio
 import json
 from datetime import datetime
 
@@ -16,7 +17,32 @@ Input format:
   For find: {"collection": "name", "query": {...}, "limit": 100}
   For aggregate: {"collection": "name", "pipeline": [...]}
 Returns: Query results as JSON"""
+        # JSON Schema of the input, used for structured LLM output
+        self.input_schema = {
+            "type": "object",
+            "properties": {
+                "collection": {"type": "string"},
+                "query": {"type": "object", "description": "find() filter"},
+                "limit": {"type": "integer"},
+                "pipeline": {
+                    "type": "array",
+                    "items": {"type": "object"},
+                    "description": "aggregate() stages; use instead of query"
+                }
+            },
+            "required": ["collection"]
+        }
         
+        # Connection is established by connect() at app startup
+        self.client = None
+        self.db = None
+        self.connected = False
+    
+    async def connect(self) -> bool:
+        """Connect and test the connection without blocking the event loop"""
+        return await asyncio.to_thread(self._connect)
+    
+    def _connect(self) -> bool:
         try:
             self.client = MongoClient(settings.mongo_uri, serverSelectionTimeoutMS=5000)
             self.db = self.client[settings.mongo_db]
@@ -26,6 +52,11 @@ Returns: Query results as JSON"""
         except Exception as e:
             print(f"MongoDB connection failed: {str(e)}")
             self.connected = False
+        return self.connected
+    
+    def close(self):
+        if self.client is not None:
+            self.client.close()
     
     async def execute(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """Execute MongoDB query"""
@@ -36,6 +67,11 @@ Returns: Query results as JSON"""
         if not collection_name:
             return {"error": "Collection name required"}
         
+        # pymongo blocks; run the query in a thread so other tools of the
+        # step (and tool timeouts) keep running meanwhile
+        return await asyncio.to_thread(self._run_query, collection_name, input_data)
+    
+    def _run_query(self, collection_name: str, input_data: Dict[str, Any]) -> Dict[str, Any]:
         try:
             collection = self.db[collection_name]
             
@@ -0,0 +1,660 @@
+import asyncio
+import contextlib
+import functools
+import multiprocessing
+import signal
+import time
+import types
+from typing import Any, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Not on Windows: runs go without CPU/memory limits
+    resource = None
+
+
+def _worker_main(conn, persistent: bool = False, **options):
+    """Worker process: import the analysis stack once, then serve requests
+
+    Requests are ("run", code) and ("variables", None). A persistent worker
+    (a session kernel) keeps one namespace for its whole life; otherwise
+    every snippet starts from fresh globals. `options` configure the
+    _Interpreter.
+    """
+    # Ctrl+C goes to the whole process group; the parent decides when we stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    interpreter = _Interpreter(**options)
+    namespace = interpreter.namespace()
+    conn.send("ready")
+    while True:
+        try:
+            op, payload = conn.recv()
+        except (EOFError, OSError):
+            return
+        if op == "variables":
+            conn.send(interpreter.variables(namespace))
+            continue
+        if not persistent:
+            namespace = interpreter.namespace()
+        conn.send((interpreter.execute(payload, namespace), _memory_bytes()))
+
+
+def _compile(code: str):
+    return compile(code, '<string>', 'exec')
+
+
+class ResourceExceeded(Exception):
+    """A snippet went over one of its resource limits"""
+
+    def __init__(self, resource_name: str, message: str):
+        super().__init__(message)
+        self.resource = resource_name
+
+
+def _resource_exceeded(resource_name: str, message: str) -> Dict[str, Any]:
+    """The structured result of a run stopped by a resource limit"""
+    return {
+        "success": False,
+        "error": f"Resource limit exceeded: {message}",
+        "resource_exceeded": resource_name
+    }
+
+
+class _Interpreter:
+    """What a worker sets up once: imports, globals template, code cache
+
+    The allowed globals are built once into a read-only template that each
+    snippet gets a shallow copy of, and compiled code objects are kept in
+    an LRU cache keyed by source, since agents often re-run the same or
+    nearly the same snippet.
+
+    Each snippet may use `cpu_limit` seconds of CPU and `memory_limit_mb`
+    of address space on top of what the worker already maps (0 = no
+    limit), enforced with soft rlimits that are lifted again afterwards.
+    Going over the CPU limit raises ResourceExceeded from the SIGXCPU
+    handler; going over the memory limit makes allocations fail with
+    MemoryError. Either way the worker survives and reports it.
+    """
+
+    def __init__(
+        self,
+        mongo: Optional[Dict[str, Any]] = None,
+        code_cache_size: int = 256,
+        cpu_limit: float = 0,
+        memory_limit_mb: int = 0,
+        figures: Optional[Dict[str, Any]] = None
+    ):
+        import matplotlib
+        matplotlib.use('Agg')  # Non-interactive backend
+        import matplotlib.pyplot as plt
+        import pandas as pd
+        import numpy as np
+        import seaborn as sns
+        from datetime import datetime, timedelta
+        import math
+        import statistics
+        import json
+        import collections
+        import re
+
+        self.plt = plt
+        self.modules = {
+            'pd': pd,
+            'np': np,
+            'plt': plt,
+            'sns': sns,
+            'datetime': datetime,
+            'timedelta': timedelta,
+            'math': math,
+            'statistics': statistics,
+            'json': json,
+            'collections': collections,
+            're': re,
+        }
+        if mongo is not None:
+            self.modules['mongo_df'] = _make_mongo_df(pd, **mongo)
+
+        # Allowed globals
+        self.template = types.MappingProxyType({
+            '__builtins__': __builtins__,
+            'print': print,
+            **self.modules,
+        })
+        self.compile = functools.lru_cache(maxsize=code_cache_size)(_compile)
+
+        from tools.figures import figure_options, save_figure
+        self.save_figure = save_figure
+        # Where and how figures are written (save_figure arguments)
+        self.figures = figures or figure_options()
+
+        self.cpu_limit = cpu_limit if resource is not None else 0
+        self.memory_limit = memory_limit_mb * 1024 * 1024 if resource is not None else 0
+        self._limited = False
+        if self.cpu_limit:
+            signal.signal(signal.SIGXCPU, self._cpu_exceeded)
+
+    def namespace(self) -> Dict[str, Any]:
+        """Fresh globals for a snippet"""
+        return dict(self.template)
+
+    def execute(self, code: str, safe_globals: Dict[str, Any]) -> Dict[str, Any]:
+        """Run one snippet, capturing its output and matplotlib figures"""
+        import io
+        import traceback
+
+        plt = self.plt
+        redirected_output = io.StringIO()
+        redirected_error = io.StringIO()
+
+        try:
+            # This process runs one job at a time, so redirecting is safe here
+            with self._limits(), contextlib.redirect_stdout(redirected_output), \
+                    contextlib.redirect_stderr(redirected_error):
+                exec(self.compile(code), safe_globals)
+
+            # Capture matplotlib figures as static files
+            images = [
+                self.save_figure(plt.figure(fig_num), **self.figures)
+                for fig_num in plt.get_fignums()
+            ]
+
+            result = {
+                "success": True,
+                "output": redirected_output.getvalue(),
+                "images": images
+            }
+
+            error_output = redirected_error.getvalue()
+            if error_output:
+                result["warnings"] = error_output
+
+            return result
+
+        except ResourceExceeded as e:
+            return _resource_exceeded(e.resource, str(e))
+
+        except Exception as e:
+            if isinstance(e, MemoryError) and self.memory_limit:
+                return _resource_exceeded(
+                    "memory", f"memory (over {self.memory_limit // 2**20} MB more address space)"
+                )
+            return {
+                "success": False,
+                "error": f"{type(e).__name__}: {str(e)}",
+                "traceback": traceback.format_exc()
+            }
+
+        finally:
+            plt.close('all')
+
+    @contextlib.contextmanager
+    def _limits(self):
+        """Apply the per-snippet CPU and memory limits for the block"""
+        if not self.cpu_limit and not self.memory_limit:
+            yield
+            return
+
+        saved = {}
+        if self.cpu_limit:
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            saved[resource.RLIMIT_CPU] = resource.getrlimit(resource.RLIMIT_CPU)
+            # RLIMIT_CPU counts the process's total CPU seconds
+            soft = int(usage.ru_utime + usage.ru_stime + self.cpu_limit) + 1
+            _lower_soft_limit(resource.RLIMIT_CPU, soft)
+        if self.memory_limit:
+            saved[resource.RLIMIT_AS] = resource.getrlimit(resource.RLIMIT_AS)
+            _lower_soft_limit(resource.RLIMIT_AS, _address_space_bytes() + self.memory_limit)
+
+        self._limited = True
+        try:
+            yield
+        finally:
+            self._limited = False
+            for limit, previous in saved.items():
+                resource.setrlimit(limit, previous)
+
+    def _cpu_exceeded(self, signum, frame):
+        # A SIGXCPU arriving after the snippet finished is stale
+        if self._limited:
+            raise ResourceExceeded("cpu", f"CPU time (over {self.cpu_limit:g}s)")
+
+    def variables(self, namespace: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Names the user's code defined, with their type and size"""
+        variables = []
+        for name, value in namespace.items():
+            if name.startswith('_') or name == 'print' or isinstance(value, types.ModuleType):
+                continue
+            if name in self.modules and value is self.modules[name]:
+                continue
+            entry = {"name": name, "type": type(value).__name__}
+            shape = getattr(value, 'shape', None)
+            if isinstance(shape, tuple):
+                entry["shape"] = list(shape)
+            elif hasattr(value, '__len__') and not callable(value):
+                try:
+                    entry["length"] = len(value)
+                except TypeError:
+                    pass
+            variables.append(entry)
+        return variables
+
+
+def _make_mongo_df(pd, uri: str, db: str, batch_size: int = 1000, max_rows: int = 100000):
+    """Build mongo_df() for a worker; it connects on first use"""
+    import warnings
+    from bson import ObjectId
+
+    state = {}
+    # The operator's limit; snippets can only ask for fewer rows
+    row_cap = max_rows
+
+    def mongo_df(collection, pipeline=None, query=None, projection=None, max_rows=None):
+        """Load a MongoDB query straight into a DataFrame
+
+        Runs aggregate(pipeline), or find(query, projection) without a
+        pipeline. Documents are read in batches and nested fields become
+        dotted columns; ObjectIds are converted to strings. At most
+        max_rows rows are loaded, and never more than the configured cap.
+        """
+        max_rows = row_cap if max_rows is None else max(0, min(int(max_rows), row_cap))
+        if pipeline is not None:
+            for stage in pipeline:
+                if '$out' in stage or '$merge' in stage:
+                    raise ValueError("mongo_df is read-only: $out and $merge are not allowed")
+
+        if 'db' not in state:
+            from pymongo import MongoClient
+            client = MongoClient(uri, serverSelectionTimeoutMS=5000)
+            state['db'] = client[db]
+        coll = state['db'][collection]
+
+        # Ask for one row more than the cap to tell whether it was hit
+        if pipeline is not None:
+            cursor = coll.aggregate(
+                list(pipeline) + [{'$limit': max_rows + 1}], batchSize=batch_size
+            )
+        else:
+            cursor = coll.find(query or {}, projection).limit(max_rows + 1).batch_size(batch_size)
+
+        # Only one batch of raw documents is held at a time
+        frames, batch, rows, truncated = [], [], 0, False
+        with cursor:
+            for doc in cursor:
+                if rows == max_rows:
+                    truncated = True
+                    break
+                batch.append(doc)
+                rows += 1
+                if len(batch) == batch_size:
+                    frames.append(pd.json_normalize(batch))
+                    batch = []
+        if batch or not frames:
+            frames.append(pd.json_normalize(batch))
+
+        df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        for column in df.columns[df.dtypes == object]:
+            if df[column].map(lambda v: isinstance(v, ObjectId)).any():
+                df[column] = df[column].map(lambda v: str(v) if isinstance(v, ObjectId) else v)
+        df = df.infer_objects()
+        if truncated:
+            warnings.warn(
+                f"mongo_df: stopped at max_rows={max_rows}; filter or aggregate "
+                "in the pipeline to load fewer rows"
+            )
+        return df
+
+    return mongo_df
+
+
+def _lower_soft_limit(limit: int, soft: int):
+    """Set a soft rlimit, keeping the hard limit (which may be lower)"""
+    _, hard = resource.getrlimit(limit)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(limit, (soft, hard))
+
+
+def _address_space_bytes() -> int:
+    """Virtual memory size of this process (0 if unknown)"""
+    import os
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return 0
+
+
+def _memory_bytes() -> int:
+    """Resident memory of this process (0 if unknown)"""
+    import os
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        pass
+    try:
+        import resource
+        # Peak rather than current, in KiB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except ImportError:
+        return 0
+
+
+class _Worker:
+    """One sandbox process and the parent's end of its pipe"""
+
+    def __init__(self, ctx, persistent: bool = False, options: Optional[Dict[str, Any]] = None):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, persistent),
+            kwargs=options or {},
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+    async def wait_ready(self, timeout: float) -> bool:
+        try:
+            return await self._readable(timeout) and self.conn.recv() == "ready"
+        except (EOFError, OSError):
+            # Died during imports
+            return False
+
+    async def call(self, op: str, payload: Any, timeout: float) -> Optional[Any]:
+        """Send a request to the worker; None if it did not answer in time"""
+        self.conn.send((op, payload))
+        if not await self._readable(timeout):
+            return None
+        return self.conn.recv()
+
+    async def _readable(self, timeout: float) -> bool:
+        """Wait until the worker has written to the pipe (or exited)
+
+        The pipe is watched by the event loop rather than polled from a
+        thread, so long executions do not tie up the default executor,
+        which the rest of the app shares. False on timeout.
+        """
+        loop = asyncio.get_running_loop()
+        readable = loop.create_future()
+        fd = self.conn.fileno()
+        try:
+            loop.add_reader(fd, lambda: readable.done() or readable.set_result(True))
+        except NotImplementedError:
+            # Proactor event loop (Windows) cannot watch pipes
+            return await asyncio.to_thread(self.conn.poll, timeout)
+        try:
+            return await asyncio.wait_for(readable, timeout)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            loop.remove_reader(fd)
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class PythonWorkerPool:
+    """Pre-warmed worker processes for running untrusted analysis code
+
+    Each worker imports pandas/numpy/matplotlib/seaborn once at spawn and
+    then runs one snippet at a time, so code never blocks the event loop and
+    concurrent requests cannot see each other's output or figures. A worker
+    that exceeds the wall-clock timeout, crashes, or whose caller gives up
+    is killed and replaced in the background.
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        startup_timeout: float = 60.0,
+        options: Optional[Dict[str, Any]] = None
+    ):
+        self.size = size
+        self.startup_timeout = startup_timeout
+        # Passed to each worker's _Interpreter
+        self.options = options
+        # Workers are spawned, not forked: forking a threaded server is unsafe
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle: Optional[asyncio.Queue] = None
+        self._workers = set()
+        self._spawning = set()
+        self.executions = 0
+        self.timeouts = 0
+        self.restarts = 0
+
+    async def start(self):
+        """Spawn the workers and wait until they are ready (idempotent)"""
+        if self._idle is not None:
+            return
+        self._idle = asyncio.Queue()
+        await asyncio.gather(*(self._spawn() for _ in range(self.size)))
+
+    async def run(self, code: str, timeout: float) -> Dict[str, Any]:
+        await self.start()
+        if not self._workers and not self._spawning:
+            return {"success": False, "error": "No Python workers available"}
+        worker = await self._idle.get()
+        self.executions += 1
+        try:
+            reply = await worker.call("run", code, timeout)
+        except asyncio.CancelledError:
+            # Nobody will read the result; the worker may still be busy
+            self._replace(worker)
+            raise
+        except (EOFError, OSError) as e:
+            self._replace(worker)
+            return {"success": False, "error": f"Python worker crashed: {type(e).__name__}"}
+
+        if reply is None:
+            self.timeouts += 1
+            self._replace(worker)
+            return _resource_exceeded(
+                "wall_clock", f"wall-clock time (over {timeout:g}s); execution was stopped"
+            )
+
+        self._idle.put_nowait(worker)
+        result, _ = reply
+        return result
+
+    def close(self):
+        """Kill every worker (called on app shutdown)"""
+        for task in self._spawning:
+            task.cancel()
+        for worker in list(self._workers):
+            worker.kill()
+        self._workers.clear()
+        self._idle = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": len(self._workers),
+            "idle": self._idle.qsize() if self._idle is not None else 0,
+            "executions": self.executions,
+            "timeouts": self.timeouts,
+            "restarts": self.restarts
+        }
+
+    async def _spawn(self):
+        worker = await asyncio.to_thread(_Worker, self._ctx, False, self.options)
+        self._workers.add(worker)
+        if not await worker.wait_ready(self.startup_timeout):
+            print("⚠️  Python worker failed to start")
+            self._workers.discard(worker)
+            worker.kill()
+            return
+        self._idle.put_nowait(worker)
+
+    def _replace(self, worker: _Worker):
+        self._workers.discard(worker)
+        worker.kill()
+        self.restarts += 1
+        task = asyncio.create_task(self._spawn())
+        self._spawning.add(task)
+        task.add_done_callback(self._spawning.discard)
+
+
+class _Kernel:
+    """A session's persistent worker (None until first used or after a reset)"""
+
+    def __init__(self):
+        self.worker: Optional[_Worker] = None
+        # One snippet at a time per session, in arrival order
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+
+
+class PythonKernels:
+    """One persistent worker process per chat session
+
+    Variables defined by one call stay available to the next call of the
+    same session, so data loaded once does not travel through the prompt
+    again. A kernel is started on the session's first call, evicted after
+    `idle_timeout` seconds without calls or to make room beyond
+    `max_kernels`, and reset (variables lost) when it times out, crashes
+    or ends a call above `memory_limit_mb` of resident memory.
+    """
+
+    def __init__(
+        self,
+        max_kernels: int = 16,
+        idle_timeout: float = 600.0,
+        memory_limit_mb: int = 1024,
+        startup_timeout: float = 60.0,
+        options: Optional[Dict[str, Any]] = None
+    ):
+        self.max_kernels = max_kernels
+        self.idle_timeout = idle_timeout
+        self.memory_limit = memory_limit_mb * 1024 * 1024
+        self.startup_timeout = startup_timeout
+        self.options = options
+        self._ctx = multiprocessing.get_context("spawn")
+        self._kernels: Dict[str, _Kernel] = {}
+        self._reaper: Optional[asyncio.Task] = None
+        self.started = 0
+        self.evicted_idle = 0
+        self.evicted_memory = 0
+        self.timeouts = 0
+
+    async def run(self, session_id: str, code: str, timeout: float) -> Dict[str, Any]:
+        if self._reaper is None and self.idle_timeout > 0:
+            self._reaper = asyncio.create_task(self._reap_idle())
+
+        kernel = self._kernels.get(session_id)
+        if kernel is None:
+            if len(self._kernels) >= self.max_kernels and not self._evict_oldest():
+                return {"success": False, "error": "Too many active Python sessions, retry shortly"}
+            kernel = self._kernels[session_id] = _Kernel()
+
+        async with kernel.lock:
+            kernel.last_used = time.monotonic()
+            if kernel.worker is None:
+                kernel.worker = await self._start_worker()
+                if kernel.worker is None:
+                    return {"success": False, "error": "Python session failed to start"}
+
+            try:
+                reply = await kernel.worker.call("run", code, timeout)
+            except asyncio.CancelledError:
+                # The worker may still be running the snippet
+                self._reset(kernel)
+                raise
+            except (EOFError, OSError) as e:
+                self._reset(kernel)
+                return {
+                    "success": False,
+                    "error": f"Python session crashed ({type(e).__name__}); its variables were lost"
+                }
+            finally:
+                kernel.last_used = time.monotonic()
+
+            if reply is None:
+                self.timeouts += 1
+                self._reset(kernel)
+                return _resource_exceeded(
+                    "wall_clock",
+                    f"wall-clock time (over {timeout:g}s); execution was stopped "
+                    "and the session's variables were lost"
+                )
+
+            result, memory = reply
+            if self.memory_limit > 0 and memory > self.memory_limit:
+                self.evicted_memory += 1
+                self._reset(kernel)
+                result["session_reset"] = (
+                    f"Session used {memory / 2**20:.0f} MB, over the "
+                    f"{self.memory_limit / 2**20:.0f} MB limit; its variables were cleared"
+                )
+            return result
+
+    async def variables(self, session_id: str) -> Optional[List[Dict[str, Any]]]:
+        """Variables alive in a session's kernel, or None if it has none"""
+        kernel = self._kernels.get(session_id)
+        if kernel is None:
+            return None
+        async with kernel.lock:
+            if kernel.worker is None:
+                return None
+            try:
+                return await kernel.worker.call("variables", None, self.startup_timeout)
+            except (EOFError, OSError):
+                self._reset(kernel)
+                return None
+
+    def close(self):
+        """Kill every kernel (called on app shutdown)"""
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        for kernel in self._kernels.values():
+            self._reset(kernel)
+        self._kernels.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": sum(1 for k in self._kernels.values() if k.worker is not None),
+            "started": self.started,
+            "evicted_idle": self.evicted_idle,
+            "evicted_memory": self.evicted_memory,
+            "timeouts": self.timeouts
+        }
+
+    async def _start_worker(self) -> Optional[_Worker]:
+        worker = await asyncio.to_thread(_Worker, self._ctx, True, self.options)
+        if not await worker.wait_ready(self.startup_timeout):
+            print("⚠️  Python session worker failed to start")
+            worker.kill()
+            return None
+        self.started += 1
+        return worker
+
+    def _reset(self, kernel: _Kernel):
+        if kernel.worker is not None:
+            kernel.worker.kill()
+            kernel.worker = None
+
+    def _evict_oldest(self) -> bool:
+        """Drop the least recently used idle kernel; False if all are busy"""
+        idle = [
+            (kernel.last_used, session_id)
+            for session_id, kernel in self._kernels.items()
+            if not kernel.lock.locked()
+        ]
+        if not idle:
+            return False
+        _, session_id = min(idle)
+        self._reset(self._kernels.pop(session_id))
+        return True
+
+    async def _reap_idle(self):
+        while True:
+            await asyncio.sleep(min(self.idle_timeout / 2, 30.0))
+            cutoff = time.monotonic() - self.idle_timeout
+            for session_id, kernel in list(self._kernels.items()):
+                if kernel.last_used < cutoff and not kernel.lock.locked():
+                    if kernel.worker is not None:
+                        self.evicted_idle += 1
+                    self._reset(self._kernels.pop(session_id))
@@ -1,11 +1,8 @@
-import io
-import sys
-import base64
-import matplotlib
-matplotlib.use('Agg')  # Non-interactive backend
-import matplotlib.pyplot as plt
-from typing import Dict, Any, Optional
-import traceback
+import re
+from typing import Dict, Any, List, Optional
+from core.config import settings
+from tools.figures import figure_options
+from tools.python_sandbox import PythonKernels, PythonWorkerPool
 
 
 class PythonTool:
@@ -16,115 +13,89 @@ class PythonTool:
         'math', 'statistics', 'json', 'collections', 're'
     }
     
+    DANGEROUS_KEYWORDS = ['import os', 'import sys', 'import subprocess', 
+                          '__import__', 'eval(', 'exec(', 'open(', 'file(']
+    # All keywords, case-insensitive, in one pass over the code
+    FORBIDDEN = re.compile('|'.join(map(re.escape, DANGEROUS_KEYWORDS)), re.IGNORECASE)
+    
     def __init__(self):
         self.name = "python"
         self.description = """Execute Python code for data analysis.
 Allowed libraries: pandas, numpy, matplotlib, seaborn, datetime, math, statistics, json, collections, re
-Returns: Text output and any matplotlib plots as base64 images
+Load MongoDB data directly: df = mongo_df("collection", pipeline=[...]) or mongo_df("collection", query={...})
+Returns: Text output and URLs of any matplotlib plots
+Variables persist between calls in the same chat session
 Input format: {"code": "your python code here"}"""
+        # JSON Schema of the input, used for structured LLM output
+        self.input_schema = {
+            "type": "object",
+            "properties": {
+                "code": {"type": "string", "description": "Python code to execute"}
+            },
+            "required": ["code"]
+        }
+        options = {
+            # mongo_df() in the sandbox reads MongoDB without going through the LLM
+            "mongo": {
+                "uri": settings.mongo_uri,
+                "db": settings.mongo_db,
+                "batch_size": settings.python_mongo_batch_size,
+                "max_rows": settings.python_mongo_max_rows
+            },
+            "code_cache_size": settings.python_code_cache_size,
+            # Per execution, on top of the wall-clock PYTHON_TIMEOUT
+            "cpu_limit": settings.python_cpu_limit,
+            "memory_limit_mb": settings.python_memory_limit_mb,
+            "figures": figure_options()
+        }
+        # Code runs in pre-warmed worker processes, off the event loop
+        self.pool = PythonWorkerPool(size=settings.python_workers, options=options)
+        # Chat sessions get their own persistent worker (None when disabled)
+        self.kernels = None
+        if settings.python_max_sessions > 0:
+            self.kernels = PythonKernels(
+                max_kernels=settings.python_max_sessions,
+                idle_timeout=settings.python_session_idle_timeout,
+                memory_limit_mb=settings.python_session_memory_mb,
+                options=options
+            )
+        # The agent passes the chat session id to stateful tools
+        self.stateful = self.kernels is not None
+    
+    async def start(self):
+        """Pre-warm the worker processes (called at app startup)"""
+        await self.pool.start()
+    
+    def close(self):
+        self.pool.close()
+        if self.kernels is not None:
+            self.kernels.close()
+    
+    async def variables(self, session_id: str) -> Optional[List[Dict[str, Any]]]:
+        """Variables alive in a session's kernel, or None if it has none"""
+        if self.kernels is None:
+            return None
+        return await self.kernels.variables(session_id)
     
-    async def execute(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Execute Python code and capture output"""
+    async def execute(self, input_data: Dict[str, Any], session_id: Optional[str] = None) -> Dict[str, Any]:
+        """Execute Python code in a worker process and capture output
+        
+        With a session_id the code runs in that session's kernel, so its
+        variables are kept for the session's next calls.
+        """
         code = input_data.get("code", "")
         
         if not code:
             return {"error": "No code provided"}
         
         # Check for dangerous operations
-        dangerous_keywords = ['import os', 'import sys', 'import subprocess', 
-                             '__import__', 'eval(', 'exec(', 'open(', 'file(']
-        for keyword in dangerous_keywords:
-            if keyword in code.lower():
-                return {"error": f"Forbidden operation: {keyword}"}
-        
-        # Prepare execution environment
-        old_stdout = sys.stdout
-        old_stderr = sys.stderr
-        redirected_output = io.StringIO()
-        redirected_error = io.StringIO()
-        
-        # Allowed globals
-        safe_globals = {
-            '__builtins__': __builtins__,
-            'print': print,
-        }
-        
-        # Import allowed modules
-        try:
-            import pandas as pd
-            import numpy as np
-            import matplotlib.pyplot as plt
-            import seaborn as sns
-            from datetime import datetime, timedelta
-            import math
-            import statistics
-            import json
-            import collections
-            import re
-            
-            safe_globals.update({
-                'pd': pd,
-                'np': np,
-                'plt': plt,
-                'sns': sns,
-                'datetime': datetime,
-                'timedelta': timedelta,
-                'math': math,
-                'statistics': statistics,
-                'json': json,
-                'collections': collections,
-                're': re,
-            })
-        except ImportError as e:
-            return {"error": f"Import error: {str(e)}"}
-        
-        try:
-            # Redirect stdout/stderr
-            sys.stdout = redirected_output
-            sys.stderr = redirected_error
-            
-            # Execute code
-            exec(code, safe_globals)
-            
-            # Capture text output
-            output = redirected_output.getvalue()
-            error_output = redirected_error.getvalue()
-            
-            # Capture matplotlib figures
-            images = []
-            figures = plt.get_fignums()
-            for fig_num in figures:
-                fig = plt.figure(fig_num)
-                buf = io.BytesIO()
-                fig.savefig(buf, format='png', dpi=100, bbox_inches='tight')
-                buf.seek(0)
-                img_base64 = base64.b64encode(buf.read()).decode('utf-8')
-                images.append(img_base64)
-                plt.close(fig)
-            
-            result = {
-                "success": True,
-                "output": output,
-                "images": images
-            }
-            
-            if error_output:
-                result["warnings"] = error_output
-            
-            return result
-            
-        except Exception as e:
-            return {
-                "success": False,
-                "error": f"{type(e).__name__}: {str(e)}",
-                "traceback": traceback.format_exc()
-            }
+        forbidden = self.FORBIDDEN.search(code)
+        if forbidden:
+            return {"error": f"Forbidden operation: {forbidden.group(0).lower()}"}
         
-        finally:
-            # Restore stdout/stderr
-            sys.stdout = old_stdout
-            sys.stderr = old_stderr
-            plt.close('all')
+        if session_id and self.kernels is not None:
+            return await self.kernels.run(session_id, code, timeout=settings.python_timeout)
+        return await self.pool.run(code, timeout=settings.python_timeout)
 
 
 # Global instance
@@ -1,9 +1,351 @@
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import base64
-import io
-from typing import Dict, Any, List
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+from core.cache import ChartCache
+from core.config import settings
+from tools.downsample import density_grid, lttb, numeric_axis
+from tools.figures import figure_options
+
+# Line charts draw markers only while points are few enough to tell apart
+MARKER_MAX_POINTS = 100
+
+# Part of the chart cache key; bump when render_chart() output changes so
+# cached charts are rendered again
+RENDER_VERSION = 1
+
+# Vega-Lite version the frontend renders (see tools.figures.VEGA_LITE)
+VEGA_LITE_SCHEMA = "https://vega.github.io/schema/vega-lite/v5.json"
+
+# Seconds between sweeps for orphaned chart files
+GC_INTERVAL = 3600.0
+
+
+def _warm_up():
+    """Import the plotting stack in a fresh render process"""
+    import matplotlib.backends.backend_agg  # noqa: F401
+
+
+def _numeric_series(x: List[Any], y: List[Any]) -> Tuple[np.ndarray, np.ndarray, bool, Optional[List[Any]]]:
+    """x and y as float arrays for downsampling: (x, y, is_date, labels)
+    
+    Dates become matplotlib date numbers. Other non-numeric x values are
+    replaced by their positions and returned as labels. Points with a
+    missing coordinate are dropped.
+    """
+    from matplotlib.dates import date2num
+    
+    if len(x) != len(y):
+        raise ValueError(f"x and y have different lengths ({len(x)} and {len(y)})")
+    ys = np.asarray(y, dtype=np.float64)
+    xs, is_date = numeric_axis(x)
+    labels = None
+    if xs is None:
+        xs, labels = np.arange(len(x), dtype=np.float64), x
+    elif is_date:
+        xs = date2num(xs)
+    finite = np.isfinite(xs) & np.isfinite(ys)
+    return xs[finite], ys[finite], is_date, labels
+
+
+def _label_x(ax, xs: np.ndarray, is_date: bool, labels: Optional[List[Any]]):
+    """Tick labels for an x axis plotted from _numeric_series() values"""
+    if is_date:
+        ax.xaxis_date()
+    elif labels is not None and len(xs):
+        ticks = xs[np.linspace(0, len(xs) - 1, min(10, len(xs))).astype(int)]
+        ax.set_xticks(ticks, [str(labels[int(t)]) for t in ticks], rotation=45, ha='right')
+
+
+def render_chart(
+    input_data: Dict[str, Any],
+    figures: Dict[str, Any],
+    max_points: int = 2000,
+    density: str = "bins"
+) -> Dict[str, Any]:
+    """Render a chart and save it as a static file
+    
+    Uses a standalone Figure with its own Agg canvas instead of pyplot's
+    global figure registry, so charts can render in parallel threads or
+    processes without sharing state.
+    
+    Series longer than `max_points` are downsampled: line charts to
+    max_points points with LTTB, scatter charts to a density plot
+    (`density` "bins", a 2D histogram, or "hexbin").
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.colors import LogNorm
+    from matplotlib.figure import Figure
+    from tools.figures import save_figure
+    
+    chart_type = input_data.get("type", "line").lower()
+    data = input_data.get("data", {})
+    title = input_data.get("title", "")
+    xlabel = input_data.get("xlabel", "")
+    ylabel = input_data.get("ylabel", "")
+    downsampled = None
+    
+    try:
+        fig = Figure(figsize=(10, 6))
+        FigureCanvasAgg(fig)
+        ax = fig.subplots()
+        
+        if chart_type == "line":
+            x = data.get("x", [])
+            y = data.get("y", [])
+            if not x or not y:
+                return {"error": "Line chart requires 'x' and 'y' data"}
+            if len(x) > max_points:
+                xs, ys, is_date, labels = _numeric_series(x, y)
+                keep = lttb(xs, ys, max_points)
+                ax.plot(xs[keep], ys[keep], linewidth=1.5)
+                _label_x(ax, xs[keep], is_date, labels)
+                downsampled = {"method": "lttb", "points": len(x), "plotted": len(keep)}
+            else:
+                ax.plot(x, y, marker='o' if len(x) <= MARKER_MAX_POINTS else None, linewidth=2)
+            ax.set_xlabel(xlabel)
+            ax.set_ylabel(ylabel)
+            ax.grid(True, alpha=0.3)
+        
+        elif chart_type == "bar":
+            x = data.get("x", [])
+            y = data.get("y", [])
+            if not x or not y:
+                return {"error": "Bar chart requires 'x' and 'y' data"}
+            ax.bar(x, y, color='steelblue', alpha=0.8)
+            ax.set_xlabel(xlabel)
+            ax.set_ylabel(ylabel)
+            ax.tick_params(axis='x', labelrotation=45)
+            for label in ax.get_xticklabels():
+                label.set_horizontalalignment('right')
+        
+        elif chart_type == "scatter":
+            x = data.get("x", [])
+            y = data.get("y", [])
+            if not x or not y:
+                return {"error": "Scatter chart requires 'x' and 'y' data"}
+            if len(x) > max_points:
+                # Too many markers to see: show where the points are dense
+                xs, ys, is_date, labels = _numeric_series(x, y)
+                if density == "hexbin":
+                    mesh = ax.hexbin(xs, ys, gridsize=80, bins='log', mincnt=1, cmap='viridis')
+                else:
+                    counts, x_edges, y_edges = density_grid(xs, ys)
+                    mesh = ax.pcolormesh(
+                        x_edges, y_edges, np.ma.masked_equal(counts.T, 0),
+                        cmap='viridis', norm=LogNorm()
+                    )
+                fig.colorbar(mesh, ax=ax, label='points')
+                _label_x(ax, xs, is_date, labels)
+                downsampled = {"method": density, "points": len(x)}
+            else:
+                ax.scatter(x, y, alpha=0.6, s=100, color='coral')
+            ax.set_xlabel(xlabel)
+            ax.set_ylabel(ylabel)
+            ax.grid(True, alpha=0.3)
+        
+        elif chart_type == "pie":
+            labels = data.get("labels", [])
+            values = data.get("values", [])
+            if not labels or not values:
+                return {"error": "Pie chart requires 'labels' and 'values' data"}
+            ax.pie(values, labels=labels, autopct='%1.1f%%', startangle=90)
+            ax.axis('equal')
+        
+        else:
+            return {"error": f"Unsupported chart type: {chart_type}"}
+        
+        if title:
+            ax.set_title(title, fontsize=14, fontweight='bold')
+        
+        fig.tight_layout()
+        
+        result = {
+            "success": True,
+            "image": save_figure(fig, **figures),
+            "type": chart_type
+        }
+        if downsampled:
+            result["downsampled"] = downsampled
+        return result
+        
+    except Exception as e:
+        return {
+            "success": False,
+            "error": f"Visualization error: {str(e)}"
+        }
+
+
+def _spec_series(
+    x: List[Any],
+    y: List[Any],
+    max_points: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, str]:
+    """x and y prepared for a Vega-Lite spec: (xs, ys, index, x type)
+    
+    xs/ys are float arrays as in _numeric_series() (dates as epoch
+    milliseconds), `index` the positions of the points to keep: points
+    with a missing coordinate are dropped and series longer than
+    `max_points` reduced with LTTB. The x type is quantitative, temporal
+    (ISO dates) or ordinal (anything else, plotted by position).
+    """
+    if len(x) != len(y):
+        raise ValueError(f"x and y have different lengths ({len(x)} and {len(y)})")
+    ys = np.asarray(y, dtype=np.float64)
+    xs, is_date = numeric_axis(x)
+    x_type = "temporal" if is_date else "quantitative"
+    if xs is None:
+        xs, x_type = np.arange(len(x), dtype=np.float64), "ordinal"
+    elif is_date:
+        xs = np.where(np.isnat(xs), np.nan, xs.astype("datetime64[ms]").astype(np.float64))
+    index = np.flatnonzero(np.isfinite(xs) & np.isfinite(ys))
+    if len(index) > max_points:
+        index = index[lttb(xs[index], ys[index], max_points)]
+    return xs, ys, index, x_type
+
+
+def chart_spec(
+    input_data: Dict[str, Any],
+    figures: Dict[str, Any],
+    max_points: int = 2000
+) -> Dict[str, Any]:
+    """Build a Vega-Lite spec of a chart for the browser to render
+    
+    Takes the same input as render_chart() and returns the same result,
+    but the saved file is the spec with its data (<hash>.vl.json) instead
+    of an image. Only validation and serialization happen here, so this is
+    cheap enough to run without a render process. Long line series are
+    reduced with LTTB and large scatter plots sent as density bins, as in
+    render_chart().
+    """
+    from tools.figures import save_spec
+    
+    chart_type = input_data.get("type", "line").lower()
+    data = input_data.get("data", {})
+    title = input_data.get("title", "")
+    x_axis = {"field": "x", "title": input_data.get("xlabel") or None}
+    y_axis = {"field": "y", "type": "quantitative", "title": input_data.get("ylabel") or None}
+    downsampled = None
+    
+    try:
+        if chart_type in ("line", "bar", "scatter"):
+            x = data.get("x", [])
+            y = data.get("y", [])
+            if not x or not y:
+                return {"error": f"{chart_type.capitalize()} chart requires 'x' and 'y' data"}
+        
+        if chart_type == "line":
+            xs, ys, index, x_type = _spec_series(x, y, max_points)
+            if len(x) > max_points:
+                downsampled = {"method": "lttb", "points": len(x), "plotted": len(index)}
+            values = [{"x": x[i], "y": ys[i].item()} for i in index.tolist()]
+            mark = {"type": "line", "point": len(values) <= MARKER_MAX_POINTS, "tooltip": True}
+            encoding = {"x": {**x_axis, "type": x_type, "sort": None}, "y": y_axis}
+        
+        elif chart_type == "bar":
+            xs, ys, index, _ = _spec_series(x, y, len(x))
+            values = [{"x": x[i], "y": ys[i].item()} for i in index.tolist()]
+            mark = {"type": "bar", "color": "steelblue", "opacity": 0.8, "tooltip": True}
+            encoding = {
+                "x": {**x_axis, "type": "ordinal", "sort": None, "axis": {"labelAngle": -45}},
+                "y": y_axis
+            }
+        
+        elif chart_type == "scatter" and len(x) > max_points:
+            # Too many points to send: send where they are dense
+            xs, ys, index, x_type = _spec_series(x, y, len(x))
+            counts, x_edges, y_edges = density_grid(xs[index], ys[index])
+            values = [
+                {
+                    "x": x_edges[i].item(), "x2": x_edges[i + 1].item(),
+                    "y": y_edges[j].item(), "y2": y_edges[j + 1].item(),
+                    "count": int(counts[i, j])
+                }
+                for i, j in zip(*(axis.tolist() for axis in np.nonzero(counts)))
+            ]
+            mark = {"type": "rect", "tooltip": True}
+            encoding = {
+                # Bin edges are numbers even for category labels
+                "x": {**x_axis, "type": "temporal" if x_type == "temporal" else "quantitative"},
+                "x2": {"field": "x2"},
+                "y": y_axis,
+                "y2": {"field": "y2"},
+                "color": {
+                    "field": "count", "type": "quantitative", "title": "points",
+                    "scale": {"type": "log", "scheme": "viridis"}
+                }
+            }
+            downsampled = {"method": "bins", "points": len(x)}
+        
+        elif chart_type == "scatter":
+            xs, ys, index, x_type = _spec_series(x, y, len(x))
+            values = [{"x": x[i], "y": ys[i].item()} for i in index.tolist()]
+            mark = {
+                "type": "point", "filled": True, "color": "coral",
+                "opacity": 0.6, "size": 100, "tooltip": True
+            }
+            encoding = {"x": {**x_axis, "type": x_type}, "y": y_axis}
+        
+        elif chart_type == "pie":
+            labels = data.get("labels", [])
+            values = data.get("values", [])
+            if not labels or not values:
+                return {"error": "Pie chart requires 'labels' and 'values' data"}
+            if len(labels) != len(values):
+                raise ValueError(f"labels and values have different lengths ({len(labels)} and {len(values)})")
+            shares = np.asarray(values, dtype=np.float64)
+            values = [
+                {"label": label, "value": value}
+                for label, value in zip(labels, shares.tolist())
+                if np.isfinite(value)
+            ]
+            mark = {"type": "arc", "tooltip": True}
+            encoding = {
+                "theta": {"field": "value", "type": "quantitative", "stack": True},
+                "color": {"field": "label", "type": "nominal", "sort": None, "title": None},
+                "tooltip": [
+                    {"field": "label", "type": "nominal"},
+                    {"field": "value", "type": "quantitative"},
+                    {"field": "share", "type": "quantitative", "format": ".1%"}
+                ]
+            }
+        
+        else:
+            return {"error": f"Unsupported chart type: {chart_type}"}
+        
+        spec = {
+            "$schema": VEGA_LITE_SCHEMA,
+            "width": "container",
+            "height": 360,
+            "data": {"values": values},
+            "mark": mark,
+            "encoding": encoding
+        }
+        if chart_type == "pie":
+            # Percentages like render_chart()'s slice labels, as tooltips
+            spec["transform"] = [
+                {"joinaggregate": [{"op": "sum", "field": "value", "as": "total"}]},
+                {"calculate": "datum.value / datum.total", "as": "share"}
+            ]
+        if title:
+            spec["title"] = title
+        
+        result = {
+            "success": True,
+            "image": save_spec(spec, figures["directory"], figures.get("url_prefix", "/static/charts")),
+            "type": chart_type
+        }
+        if downsampled:
+            result["downsampled"] = downsampled
+        return result
+        
+    except Exception as e:
+        return {
+            "success": False,
+            "error": f"Visualization error: {str(e)}"
+        }
 
 
 class VisualizeTool:
@@ -20,86 +362,131 @@ Input format: {
   "xlabel": "X Label",
   "ylabel": "Y Label"
 }
-Returns: Base64 encoded PNG image"""
+Long line series are downsampled and large scatter plots drawn as point density
+Returns: URL of the chart (an image, or a chart spec the UI renders)"""
+        # JSON Schema of the input, used for structured LLM output
+        self.input_schema = {
+            "type": "object",
+            "properties": {
+                "type": {"type": "string", "enum": ["line", "bar", "scatter", "pie"]},
+                "data": {
+                    "type": "object",
+                    "properties": {
+                        "x": {"type": "array"},
+                        "y": {"type": "array"},
+                        "labels": {"type": "array"},
+                        "values": {"type": "array"}
+                    },
+                    "description": "x/y for line, bar and scatter; labels/values for pie"
+                },
+                "title": {"type": "string"},
+                "xlabel": {"type": "string"},
+                "ylabel": {"type": "string"}
+            },
+            "required": ["type", "data"]
+        }
+        
+        # Charts are Vega-Lite specs rendered by the browser, or images
+        # rendered in worker processes, off the event loop
+        self.figures = figure_options()
+        self._executor = None
+        
+        # Rendered charts by spec, files shared with the static mount
+        self.cache = None
+        if settings.chart_cache_enabled:
+            self.cache = ChartCache(
+                self.figures["directory"],
+                max_bytes=settings.chart_cache_max_mb * 2**20,
+                orphan_ttl=settings.chart_orphan_ttl
+            )
+        self._gc_task: Optional[asyncio.Task] = None
+    
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=settings.render_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_warm_up
+            )
+        return self._executor
+    
+    async def start(self):
+        """Load the chart cache and pre-warm the render processes if charts
+        are images (called at app startup)"""
+        if self.cache is not None:
+            await asyncio.to_thread(self.cache.load)
+            if self._gc_task is None:
+                self._gc_task = asyncio.create_task(self._collect_garbage())
+        if settings.chart_output != "png":
+            return
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(
+            loop.run_in_executor(self._pool(), _warm_up)
+            for _ in range(settings.render_workers)
+        ))
+    
+    async def _collect_garbage(self):
+        while True:
+            removed = await asyncio.to_thread(self.cache.collect_garbage)
+            if removed:
+                print(f"Removed {removed} orphaned chart files")
+            await asyncio.sleep(GC_INTERVAL)
+    
+    def close(self):
+        if self._gc_task is not None:
+            self._gc_task.cancel()
+            self._gc_task = None
+        self._shutdown_pool()
+    
+    def _shutdown_pool(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
     
     async def execute(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """Create visualization"""
-        chart_type = input_data.get("type", "line").lower()
-        data = input_data.get("data", {})
-        title = input_data.get("title", "")
-        xlabel = input_data.get("xlabel", "")
-        ylabel = input_data.get("ylabel", "")
-        
-        if not data:
+        if not input_data.get("data", {}):
             return {"error": "Data required for visualization"}
         
+        options = {
+            "version": RENDER_VERSION,
+            "output": settings.chart_output,
+            "figures": self.figures,
+            "max_points": settings.chart_max_points,
+            "density": settings.chart_density
+        }
+        if self.cache is not None:
+            # Hashing a large spec is real work; keep it off the event loop
+            key = await asyncio.to_thread(self.cache.key, input_data, options)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        
+        if settings.chart_output == "vega":
+            result = await asyncio.to_thread(
+                chart_spec, input_data, self.figures, settings.chart_max_points
+            )
+        else:
+            result = await self._render(input_data)
+        
+        if self.cache is not None and result.get("success"):
+            await asyncio.to_thread(self.cache.set, key, result)
+        return result
+    
+    async def _render(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Render the chart as an image in a worker process"""
+        loop = asyncio.get_running_loop()
         try:
-            fig, ax = plt.subplots(figsize=(10, 6))
-            
-            if chart_type == "line":
-                x = data.get("x", [])
-                y = data.get("y", [])
-                if not x or not y:
-                    return {"error": "Line chart requires 'x' and 'y' data"}
-                ax.plot(x, y, marker='o', linewidth=2)
-                ax.set_xlabel(xlabel)
-                ax.set_ylabel(ylabel)
-                ax.grid(True, alpha=0.3)
-            
-            elif chart_type == "bar":
-                x = data.get("x", [])
-                y = data.get("y", [])
-                if not x or not y:
-                    return {"error": "Bar chart requires 'x' and 'y' data"}
-                ax.bar(x, y, color='steelblue', alpha=0.8)
-                ax.set_xlabel(xlabel)
-                ax.set_ylabel(ylabel)
-                plt.xticks(rotation=45, ha='right')
-            
-            elif chart_type == "scatter":
-                x = data.get("x", [])
-                y = data.get("y", [])
-                if not x or not y:
-                    return {"error": "Scatter chart requires 'x' and 'y' data"}
-                ax.scatter(x, y, alpha=0.6, s=100, color='coral')
-                ax.set_xlabel(xlabel)
-                ax.set_ylabel(ylabel)
-                ax.grid(True, alpha=0.3)
-            
-            elif chart_type == "pie":
-                labels = data.get("labels", [])
-                values = data.get("values", [])
-                if not labels or not values:
-                    return {"error": "Pie chart requires 'labels' and 'values' data"}
-                ax.pie(values, labels=labels, autopct='%1.1f%%', startangle=90)
-                ax.axis('equal')
-            
-            else:
-                return {"error": f"Unsupported chart type: {chart_type}"}
-            
-            if title:
-                ax.set_title(title, fontsize=14, fontweight='bold')
-            
-            plt.tight_layout()
-            
-            # Convert to base64
-            buf = io.BytesIO()
-            fig.savefig(buf, format='png', dpi=100, bbox_inches='tight')
-            buf.seek(0)
-            img_base64 = base64.b64encode(buf.read()).decode('utf-8')
-            plt.close(fig)
-            
-            return {
-                "success": True,
-                "image": img_base64,
-                "type": chart_type
-            }
-            
-        except Exception as e:
-            plt.close('all')
+            return await loop.run_in_executor(
+                self._pool(), render_chart, input_data, self.figures,
+                settings.chart_max_points, settings.chart_density
+            )
+        except BrokenProcessPool:
+            # A render process died; the next chart gets a fresh pool
+            self._shutdown_pool()
             return {
                 "success": False,
-                "error": f"Visualization error: {str(e)}"
+                "error": "Visualization error: render worker crashed"
             }
 
 
@@ -133,6 +133,7 @@
 
 # # Global instance
 # web_search_tool = WebSearchTool()
+import asyncio
 import httpx
 from typing import Dict, Any, List
 from core.config import settings
@@ -147,6 +148,15 @@ class WebSearchTool:
         self.description = """Search the web for current information.
 Input format: {"query": "your search query", "count": 5}
 Returns: List of search results with title, snippet, and url"""
+        # JSON Schema of the input, used for structured LLM output
+        self.input_schema = {
+            "type": "object",
+            "properties": {
+                "query": {"type": "string"},
+                "count": {"type": "integer"}
+            },
+            "required": ["query"]
+        }
 
         # Always available - no API key!
         self.available = True
@@ -165,9 +175,10 @@ Returns: List of search results with title, snippet, and url"""
                 from duckduckgo_search import DDGS
 
                 results = []
-                ddgs = DDGS()
-                search_results = list(
-                    ddgs.text(query, max_results=count * 2)
+                # DDGS is blocking; search in a thread so other tools of the
+                # step, tool timeouts and other requests keep running
+                search_results = await asyncio.to_thread(
+                    self._ddgs_text, DDGS, query, count * 2
                 )  # Get more to filter
 
                 for result in search_results[:count]:
@@ -209,6 +220,10 @@ Returns: List of search results with title, snippet, and url"""
         except Exception as e:
             return {"success": False, "error": f"Search error: {str(e)}"}
 
+    @staticmethod
+    def _ddgs_text(ddgs_class, query: str, max_results: int) -> List[Dict]:
+        return list(ddgs_class().text(query, max_results=max_results))
+
     def _clean_url(self, url: str) -> str:
         """Clean and decode URLs"""
         try:
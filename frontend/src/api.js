@@ -2,6 +2,10 @@ import axios from 'axios';
 
 const API_BASE = import.meta.env.VITE_API_BASE || 'http://localhost:8000';
 
+// Charts are served by the backend as static files; responses carry their
+// paths (e.g. /static/charts/<hash>.png)
+export const assetUrl = (path) => new URL(path, API_BASE).href;
+
 const api = axios.create({
   baseURL: API_BASE,
   headers: {
@@ -22,6 +26,52 @@ export const chatWithAgent = async (messages, userMessage = null) => {
   }
 };
 
+// Stream agent events (Server-Sent Events over a POST body).
+// History is kept server-side: pass the session_id of the previous "done"
+// event, or null to start a new session.
+// onEvent is called with each parsed event: token, tool_start, tool_end,
+// artifact, done or error. Resolves with the final "done" event, whose
+// messages are only the new ones of this turn.
+export const streamChatWithAgent = async (sessionId, userMessage, onEvent) => {
+  const response = await fetch(`${API_BASE}/agent/chat/stream`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ session_id: sessionId, user_message: userMessage }),
+  });
+
+  if (!response.ok) {
+    const detail = await response.json().catch(() => ({}));
+    throw new Error(detail.detail || `Stream request failed (${response.status})`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let final = null;
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    // Events are separated by a blank line
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const raw = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      const dataLine = raw.split('\n').find((line) => line.startsWith('data: '));
+      if (!dataLine) continue;
+
+      const event = JSON.parse(dataLine.slice(6));
+      if (event.type === 'done') final = event;
+      if (event.type === 'error') throw new Error(event.error);
+      onEvent(event);
+    }
+  }
+
+  return final;
+};
+
 export const getHealth = async () => {
   try {
     const response = await api.get('/health');
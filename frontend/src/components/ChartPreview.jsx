@@ -1,19 +1,78 @@
-import React from 'react';
+import React, { useEffect, useRef, useState } from 'react';
+import { assetUrl } from '../api';
+
+// Charts sent as Vega-Lite specs (<hash>.vl.json) are rendered here;
+// anything else is an image
+const isSpec = (url) => url.endsWith('.vl.json');
+
+// vega-embed is not bundled: deployments that opt into Vega-Lite charts
+// (CHART_OUTPUT=vega) point VITE_VEGA_EMBED_URL at an ES module build they
+// serve themselves, loaded on first use
+const VEGA_EMBED_URL = import.meta.env.VITE_VEGA_EMBED_URL;
+
+const VegaChart = ({ url }) => {
+  const container = useRef(null);
+  const [failed, setFailed] = useState(false);
+
+  useEffect(() => {
+    let view = null;
+    let cancelled = false;
+
+    if (!VEGA_EMBED_URL) {
+      console.error('Chart render error: VITE_VEGA_EMBED_URL is not set');
+      setFailed(true);
+      return undefined;
+    }
+
+    import(/* @vite-ignore */ VEGA_EMBED_URL)
+      .then(({ default: embed }) => embed(container.current, assetUrl(url), { actions: false }))
+      .then((result) => {
+        if (cancelled) {
+          result.finalize();
+        } else {
+          view = result;
+        }
+      })
+      .catch((error) => {
+        console.error('Chart render error:', error);
+        if (!cancelled) {
+          setFailed(true);
+        }
+      });
+
+    return () => {
+      cancelled = true;
+      if (view) {
+        view.finalize();
+      }
+    };
+  }, [url]);
+
+  if (failed) {
+    return <div className="chart-error">Chart could not be displayed</div>;
+  }
+  return <div ref={container} className="chart-spec" />;
+};
 
 const ChartPreview = ({ images }) => {
   if (!images || images.length === 0) {
     return null;
   }
-  
+
   return (
     <div className="chart-preview">
-      {images.map((image, index) => (
+      {images.map((url, index) => (
         <div key={index} className="chart-item">
-          <img 
-            src={`data:image/png;base64,${image}`} 
-            alt={`Chart ${index + 1}`}
-            className="chart-image"
-          />
+          {isSpec(url) ? (
+            <VegaChart url={url} />
+          ) : (
+            <img
+              src={assetUrl(url)}
+              alt={`Chart ${index + 1}`}
+              className="chart-image"
+              loading="lazy"
+            />
+          )}
         </div>
       ))}
     </div>
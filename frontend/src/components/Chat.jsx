@@ -1,7 +1,7 @@
 import React, { useState, useRef, useEffect } from 'react';
 import MessageBubble from './MessageBubble';
 import ChartPreview from './ChartPreview';
-import { chatWithAgent } from '../api';
+import { streamChatWithAgent } from '../api';
 
 const Chat = () => {
   const [messages, setMessages] = useState([]);
@@ -9,6 +9,10 @@ const Chat = () => {
   const [loading, setLoading] = useState(false);
   const [artifacts, setArtifacts] = useState([]);
   const [error, setError] = useState(null);
+  const [draft, setDraft] = useState('');
+  // Tools of the current step (several may run at once)
+  const [activeTools, setActiveTools] = useState([]);
+  const [sessionId, setSessionId] = useState(null);
   const messagesEndRef = useRef(null);
   const inputRef = useRef(null);
 
@@ -18,7 +22,7 @@ const Chat = () => {
 
   useEffect(() => {
     scrollToBottom();
-  }, [messages, artifacts]);
+  }, [messages, artifacts, draft]);
 
   const handleSubmit = async (e) => {
     e.preventDefault();
@@ -37,11 +41,31 @@ const Chat = () => {
     setMessages(newMessages);
 
     try {
-      // Call API
-      const response = await chatWithAgent(messages, userMessage);
+      // Call API, rendering tokens and tool progress as they stream in
+      const response = await streamChatWithAgent(sessionId, userMessage, (event) => {
+        if (event.type === 'token') {
+          setDraft((prev) => prev + event.content);
+        } else if (event.type === 'tool_start') {
+          // Tokens so far were the tool call itself, not the answer
+          setDraft('');
+          setActiveTools((prev) => [...prev, event.tool]);
+        } else if (event.type === 'tool_end') {
+          setActiveTools((prev) => {
+            const index = prev.indexOf(event.tool);
+            return index === -1 ? prev : [...prev.slice(0, index), ...prev.slice(index + 1)];
+          });
+        } else if (event.type === 'artifact') {
+          setArtifacts((prev) => [...prev, event.url]);
+        }
+      });
+
+      if (!response) {
+        throw new Error('Stream ended without a response');
+      }
       
-      // Update messages with full conversation
-      setMessages(response.messages);
+      // The server keeps the history; the response holds only this turn
+      setSessionId(response.session_id);
+      setMessages([...messages, ...response.messages]);
       
       // Update artifacts (charts/images)
       if (response.artifacts && response.artifacts.length > 0) {
@@ -55,6 +79,10 @@ const Chat = () => {
       
     } catch (err) {
       console.error('Chat error:', err);
+      // An expired session can't be resumed; the next message starts a new one
+      if (err.message?.includes('Session not found')) {
+        setSessionId(null);
+      }
       setError(err.response?.data?.detail || err.message || 'Failed to get response from agent');
       
       // Add error message to chat
@@ -66,6 +94,8 @@ const Chat = () => {
         }
       ]);
     } finally {
+      setDraft('');
+      setActiveTools([]);
       setLoading(false);
       inputRef.current?.focus();
     }
@@ -73,6 +103,7 @@ const Chat = () => {
 
   const handleClear = () => {
     setMessages([]);
+    setSessionId(null);
     setArtifacts([]);
     setError(null);
     setInput('');
@@ -134,10 +165,18 @@ const Chat = () => {
               </div>
             )}
             
-            {loading && (
+            {loading && draft && activeTools.length === 0 && (
+              <MessageBubble message={{ role: 'assistant', content: draft }} />
+            )}
+            
+            {loading && (!draft || activeTools.length > 0) && (
               <div className="loading-indicator">
                 <div className="spinner"></div>
-                <span>DataPilot is thinking...</span>
+                <span>
+                  {activeTools.length > 0
+                    ? `Running ${activeTools.join(', ')}...`
+                    : 'DataPilot is thinking...'}
+                </span>
               </div>
             )}
           </>